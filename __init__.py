@@ -28,11 +28,34 @@ __version__ = '1.0.0'
 __author__ = 'Emergent AI'
 __license__ = 'MIT'
 
-# Экспорт основных классов для удобного импорта
-from harley_diagnostics import HarleyDiagnostics
-from j2534_wrapper import J2534Wrapper, J2534Exception
-from isotp_handler import ISOTPHandler, ISOTPException
-from uds_client import UDSClient, UDSException
+# Ленивый экспорт основных классов (PEP 562):
+# тяжёлые модули (ctypes, логирование) загружаются только при первом обращении
+_LAZY = {
+    'HarleyDiagnostics': 'harley_diagnostics',
+    'J2534Wrapper': 'j2534_wrapper',
+    'J2534Exception': 'j2534_wrapper',
+    'ISOTPHandler': 'isotp_handler',
+    'ISOTPException': 'isotp_handler',
+    'UDSClient': 'uds_client',
+    'UDSException': 'uds_client',
+}
+
+
+def __getattr__(name):
+    """Ленивая загрузка классов при первом обращении к атрибуту"""
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Кэширование для последующих обращений
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     'HarleyDiagnostics',
@@ -12,7 +12,17 @@
 
 import sys
 import os
-import platform
+
+from system_info import get_system_info
+
+# sys.platform — строковая константа интерпретатора, без syscall'ов
+IS_WINDOWS = sys.platform.startswith("win")
+
+# Директория проекта добавляется в sys.path один раз на модуль:
+# повторные insert'ы удлиняют путь поиска и замедляют каждый импорт
+_HERE = os.path.dirname(os.path.abspath(__file__))
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
 
 def print_header(text):
     """Красивый заголовок"""
@@ -31,8 +41,8 @@ def print_status(check, status, message=""):
 def check_python_version():
     """Проверка версии Python"""
     version = sys.version_info
-    is_32bit = sys.maxsize <= 2**32
-    
+    is_32bit = get_system_info().is_32bit
+
     print(f"Python версия: {version.major}.{version.minor}.{version.micro}")
     print(f"Архитектура: {'32-бит' if is_32bit else '64-бит'}")
     
@@ -50,27 +60,25 @@ def check_python_version():
 
 def check_operating_system():
     """Проверка операционной системы"""
-    os_name = platform.system()
-    print(f"Операционная система: {os_name} {platform.release()}")
+    info = get_system_info()
+    os_name = info.os
+    print(f"Операционная система: {os_name} {info.release}")
     
-    if os_name == "Windows":
+    if IS_WINDOWS:
         return print_status("Windows", True)
     else:
         return print_status("Windows", False, "Требуется Windows")
 
 def check_dll_exists():
     """Проверка наличия J2534 DLL"""
-    # Добавление путей
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    
     try:
         import config
         
-        # Проверка основного пути
+        # Проверка основного пути (через общий stat-кэш config)
         main_path = config.J2534_DLL_PATH
         print(f"\nОсновной путь: {main_path}")
-        
-        if os.path.exists(main_path):
+
+        if config._path_exists(main_path):
             print_status("Основной DLL", True, f"Найден")
             return True
         else:
@@ -100,23 +108,26 @@ def check_dll_exists():
         return False
 
 def check_imports():
-    """Проверка импорта модулей"""
+    """Проверка доступности модулей"""
+    import importlib.util
+
     modules = [
         ('ctypes', 'Встроенный'),
         ('threading', 'Встроенный'),
         ('logging', 'Встроенный'),
         ('time', 'Встроенный'),
     ]
-    
+
     all_ok = True
     for module_name, source in modules:
-        try:
-            __import__(module_name)
+        # find_spec проверяет доступность без выполнения тела модуля —
+        # важно для проектных модулей вроде j2534_wrapper (загрузка DLL)
+        if importlib.util.find_spec(module_name) is not None:
             print_status(f"Модуль {module_name}", True, f"({source})")
-        except ImportError:
+        else:
             print_status(f"Модуль {module_name}", False)
             all_ok = False
-    
+
     return all_ok
 
 def check_project_files():
@@ -134,15 +145,20 @@ def check_project_files():
         'EXPERIMENTAL_GUIDE.md'
     ]
     
+    # Один readdir() вместо stat() на каждый файл
+    try:
+        present = {entry.name for entry in os.scandir(_HERE)}
+    except OSError:
+        present = set()
+
     all_ok = True
     for filename in files:
-        path = os.path.join(os.path.dirname(__file__), filename)
-        if os.path.exists(path):
+        if filename in present:
             print_status(filename, True)
         else:
             print_status(filename, False, "Отсутствует")
             all_ok = False
-    
+
     return all_ok
 
 def test_j2534_connection():
@@ -155,7 +171,6 @@ def test_j2534_connection():
         return None
     
     try:
-        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
         from j2534_wrapper import J2534Wrapper
         
         print("Попытка открыть устройство...")
@@ -1,6 +1,25 @@
 """Конфигурация для диагностики Harley-Davidson через J2534"""
 
+import functools
 import os
+import types
+
+# Явный список экспортируемых имён (единственный канонический модуль конфигурации)
+__all__ = [
+    'J2534_DLL_PATH', 'ALTERNATIVE_DLL_PATHS', 'find_dll_path',
+    'CAN_PROTOCOL', 'CAN_BAUDRATE', 'CAN_FLAGS',
+    'UDS_REQUEST_ID', 'UDS_RESPONSE_ID', 'ALTERNATIVE_CAN_IDS',
+    'ISO_TP_BS', 'ISO_TP_STMIN', 'ISO_TP_TIMEOUT', 'RX_QUEUE_MAXSIZE',
+    'DID_CACHE_TTL',
+    'UDS_SESSION_TIMEOUT', 'UDS_P2_STAR_TIMEOUT', 'TESTER_PRESENT_INTERVAL',
+    'DIDS', 'LIKELY_ODOMETER_DIDS',
+    'ODOMETER_DID', 'ODOMETER_SCALE_FACTOR', 'ODOMETER_UNIT',
+    'LOG_LEVEL', 'LOG_TO_FILE', 'LOG_FILE',
+    'MAX_RETRY_ATTEMPTS', 'RETRY_INITIAL_DELAY', 'RETRY_BACKOFF_FACTOR',
+    'RETRY_MAX_DELAY',
+    'ENABLE_AUTO_RECOVERY', 'CONNECTION_HEALTH_CHECK_INTERVAL',
+    'ENABLE_DIAGNOSTIC_REPORTS', 'AUTO_SAVE_CRITICAL_LOGS',
+]
 
 # Путь к J2534 DLL (настройте под вашу систему)
 J2534_DLL_PATH = r"C:\Program Files (x86)\OpenECU\OpenPort 2.0\drivers\openport 2.0\openport.dll"
@@ -13,17 +32,25 @@ ALTERNATIVE_DLL_PATHS = [
     r"openport.dll"  # Если DLL в PATH
 ]
 
+@functools.lru_cache(maxsize=32)
+def _path_exists(path):
+    """Кэшированная проверка существования пути (один stat() на путь за процесс)"""
+    return os.path.exists(path)
+
+
+@functools.lru_cache(maxsize=1)
 def find_dll_path():
-    """Автоматический поиск DLL в стандартных путях"""
-    # Проверка основного пути
-    if os.path.exists(J2534_DLL_PATH):
-        return J2534_DLL_PATH
-    
-    # Проверка альтернативных путей
-    for path in ALTERNATIVE_DLL_PATHS:
-        if os.path.exists(path):
+    """Автоматический поиск DLL в стандартных путях
+
+    Результат кэшируется на время работы процесса (один набор stat()
+    вместо повторных проверок). Для сброса: find_dll_path.cache_clear()
+    и _path_exists.cache_clear()
+    """
+    # Основной путь проверяется первым, затем альтернативные
+    for path in [J2534_DLL_PATH, *ALTERNATIVE_DLL_PATHS]:
+        if _path_exists(path):
             return path
-    
+
     return None  # DLL не найдена
 
 # CAN параметры для HDLAN (Harley-Davidson Local Area Network)
@@ -49,20 +76,36 @@ ISO_TP_BS = 0x00  # Block Size (0 = непрерывная передача)
 ISO_TP_STMIN = 0x00  # Separation Time minimum (0 мс)
 ISO_TP_TIMEOUT = 1000  # Тайм-аут ожидания кадра (мс)
 
+# Время жизни кэша ответов на ReadDataByIdentifier (сек): повторные
+# чтения одного DID в этом окне не занимают шину
+DID_CACHE_TTL = 0.3
+
+# Ограничение очереди принятых кадров на каждый CAN ID: при переполнении
+# (потребитель не успевает) старые кадры вытесняются, память не растёт
+RX_QUEUE_MAXSIZE = 4096
+
 # UDS параметры
 UDS_SESSION_TIMEOUT = 5000  # Тайм-аут диагностической сессии (мс)
+UDS_P2_STAR_TIMEOUT = 5000  # Ожидание ответа после NRC 0x78 response pending (мс)
 TESTER_PRESENT_INTERVAL = 2.0  # Интервал отправки TesterPresent (сек)
 
 # DIDs для диагностики Harley-Davidson
-DIDS = {
+# MappingProxyType: единственный общий экземпляр, защищённый от случайной мутации
+_DIDS_RAW = {
     'VIN': 0xF190,  # Vehicle Identification Number (стандартный)
     'ECU_INFO': 0xF191,
     'CALIBRATION_ID': 0xF192,
     'ECU_SERIAL': 0xF18C,
     'DIAGNOSTIC_ID': 0xF186,
     # Одометр - точный DID неизвестен, будем сканировать
-    'ODOMETER_CANDIDATES': list(range(0xF191, 0xF1A0))  # Диапазон для поиска
+    # range вместо list: O(1) по памяти, итерация и индексация работают так же
+    'ODOMETER_CANDIDATES': range(0xF191, 0xF1A0)  # Диапазон для поиска
 }
+DIDS = types.MappingProxyType(_DIDS_RAW)
+
+# Наиболее вероятные DID одометра для Harley-Davidson — проверяются
+# первыми при сканировании, чтобы при удаче не проходить весь диапазон
+LIKELY_ODOMETER_DIDS = (0xF197, 0xF1A0, 0xF194, 0xF191)
 
 # Найденные параметры одометра (заполните после эксперимента)
 ODOMETER_DID = None  # Например: 0xF192 (определяется экспериментально)
@@ -78,6 +121,7 @@ LOG_FILE = 'harley_diagnostics.log'
 MAX_RETRY_ATTEMPTS = 3  # Максимальное количество попыток retry
 RETRY_INITIAL_DELAY = 1.0  # Начальная задержка между попытками (сек)
 RETRY_BACKOFF_FACTOR = 2.0  # Множитель для exponential backoff
+RETRY_MAX_DELAY = 30.0  # Потолок задержки между попытками (сек)
 ENABLE_AUTO_RECOVERY = True  # Автоматическое восстановление соединения
 CONNECTION_HEALTH_CHECK_INTERVAL = 30.0  # Интервал проверки здоровья соединения (сек)
 
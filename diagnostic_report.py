@@ -6,21 +6,64 @@
 
 import logging
 import datetime
-import platform
-import sys
 import os
 from typing import Optional, Dict, Any, List
-import json
+
+from system_info import get_system_info
 
 logger = logging.getLogger(__name__)
 
+# Разделители отчёта (вычисляются один раз на модуль, а не в каждом вызове)
+_HR = "-" * 80 + "\n"
+_DHR = "=" * 80 + "\n"
+
+# Рекомендации по категориям ошибок (одноразовая таблица вместо if/elif цепочки)
+_RECOMMENDATIONS = {
+    'hardware': (
+        "1. ПРОБЛЕМЫ С ОБОРУДОВАНИЕМ:\n"
+        "   - Проверьте подключение OpenPort 2.0 к USB порту\n"
+        "   - Убедитесь, что драйверы установлены корректно\n"
+        "   - Попробуйте другой USB порт\n"
+        "   - Проверьте, не используется ли адаптер другой программой\n"
+    ),
+    'connection': (
+        "2. ПРОБЛЕМЫ С ПОДКЛЮЧЕНИЕМ К МОТОЦИКЛУ:\n"
+        "   - Проверьте 6-pin адаптер H-D → OBD-II подключение\n"
+        "   - Убедитесь, что адаптер подключен к диагностическому порту мотоцикла\n"
+        "   - Включите зажигание (без запуска двигателя)\n"
+        "   - Проверьте правильность распиновки адаптера (CAN H/L на pin 3/4)\n"
+        "   - Попробуйте запустить с флагом --auto-detect для поиска CAN ID\n"
+    ),
+    'protocol': (
+        "3. ОШИБКИ ПРОТОКОЛА:\n"
+        "   - Возможно неправильные CAN ID адреса\n"
+        "   - Попробуйте автоматический поиск: python main.py --read-vin --auto-detect\n"
+        "   - Проверьте скорость CAN шины (обычно 500 кбит/с для HDLAN)\n"
+        "   - Убедитесь, что мотоцикл поддерживает протокол UDS\n"
+    ),
+    'timeout': (
+        "4. ТАЙМ-АУТЫ:\n"
+        "   - Увеличьте значения timeout в config.py\n"
+        "   - Проверьте качество соединения адаптера\n"
+        "   - Убедитесь, что ЭБУ готов к диагностике (зажигание включено)\n"
+    ),
+    'configuration': (
+        "5. ПРОБЛЕМЫ С КОНФИГУРАЦИЕЙ:\n"
+        "   - Проверьте путь к J2534 DLL в config.py\n"
+        "   - Убедитесь, что все параметры в config.py корректны\n"
+        "   - Запустите: python check_system.py для проверки системы\n"
+    ),
+}
+
 
 class DiagnosticReport:
     """Генератор детальных диагностических отчётов"""
     
     def __init__(self, output_dir: str = "reports"):
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+        # Директория создаётся лениво при первой генерации отчёта,
+        # чтобы импорт модуля не делал syscall'ов на файловой системе
+        self._output_dir_ensured = False
     
     def generate_report(self, 
                        error_handler,
@@ -31,18 +74,27 @@ class DiagnosticReport:
         timestamp = datetime.datetime.now()
         report_filename = f"diagnostic_report_{timestamp.strftime('%Y%m%d_%H%M%S')}.txt"
         report_path = os.path.join(self.output_dir, report_filename)
-        
+
         try:
+            if not self._output_dir_ensured:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._output_dir_ensured = True
+
+            # Отчёт собирается в памяти и записывается одним вызовом write()
+            # вместо десятков мелких f.write (меньше syscall'ов и перекодирований)
+            parts = []
+            self._write_header(parts, timestamp)
+            self._write_system_info(parts)
+            self._write_configuration_info(parts)
+            self._write_connection_state(parts, connection_state)
+            self._write_error_summary(parts, error_handler)
+            self._write_operation_context(parts, operation_context)
+            self._write_recommendations(parts, error_handler)
+            self._write_footer(parts)
+
             with open(report_path, 'w', encoding='utf-8') as f:
-                self._write_header(f, timestamp)
-                self._write_system_info(f)
-                self._write_configuration_info(f)
-                self._write_connection_state(f, connection_state)
-                self._write_error_summary(f, error_handler)
-                self._write_operation_context(f, operation_context)
-                self._write_recommendations(f, error_handler)
-                self._write_footer(f)
-            
+                f.write(''.join(parts))
+
             logger.info(f"✅ Диагностический отчёт сохранён: {report_path}")
             return report_path
             
@@ -50,189 +102,178 @@ class DiagnosticReport:
             logger.error(f"Ошибка создания отчёта: {e}")
             return ""
     
-    def _write_header(self, f, timestamp):
+    def _write_header(self, parts, timestamp):
         """Заголовок отчёта"""
-        f.write("="*80 + "\n")
-        f.write("   ДИАГНОСТИЧЕСКИЙ ОТЧЁТ\n")
-        f.write("   Harley-Davidson XG750A Diagnostic Tool\n")
-        f.write("="*80 + "\n")
-        f.write(f"\nДата и время: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write("\n")
+        parts.extend((
+            _DHR,
+            "   ДИАГНОСТИЧЕСКИЙ ОТЧЁТ\n",
+            "   Harley-Davidson XG750A Diagnostic Tool\n",
+            _DHR,
+            f"\nДата и время: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "\n",
+        ))
     
-    def _write_system_info(self, f):
+    def _write_system_info(self, parts):
         """Информация о системе"""
-        f.write("-"*80 + "\n")
-        f.write("ИНФОРМАЦИЯ О СИСТЕМЕ\n")
-        f.write("-"*80 + "\n")
+        parts.append(_HR)
+        parts.append("ИНФОРМАЦИЯ О СИСТЕМЕ\n")
+        parts.append(_HR)
         
-        f.write(f"Операционная система: {platform.system()} {platform.release()}\n")
-        f.write(f"Версия: {platform.version()}\n")
-        f.write(f"Архитектура: {platform.machine()}\n")
-        f.write(f"Python версия: {sys.version.split()[0]}\n")
-        f.write(f"Python архитектура: {'32-bit' if sys.maxsize <= 2**32 else '64-bit'}\n")
-        f.write(f"Исполняемый файл: {sys.executable}\n")
-        f.write("\n")
+        info = get_system_info()
+        parts.extend((
+            f"Операционная система: {info.os} {info.release}\n",
+            f"Версия: {info.version}\n",
+            f"Архитектура: {info.machine}\n",
+            f"Python версия: {info.py_version}\n",
+            f"Python архитектура: {info.py_arch}\n",
+            f"Исполняемый файл: {info.executable}\n",
+            "\n",
+        ))
     
-    def _write_configuration_info(self, f):
+    def _write_configuration_info(self, parts):
         """Информация о конфигурации"""
         try:
             import config
             
-            f.write("-"*80 + "\n")
-            f.write("КОНФИГУРАЦИЯ\n")
-            f.write("-"*80 + "\n")
+            parts.append(_HR)
+            parts.append("КОНФИГУРАЦИЯ\n")
+            parts.append(_HR)
             
-            f.write(f"J2534 DLL Path: {config.J2534_DLL_PATH}\n")
-            f.write(f"DLL существует: {'Да' if os.path.exists(config.J2534_DLL_PATH) else 'Нет'}\n")
-            f.write(f"CAN Protocol: {config.CAN_PROTOCOL}\n")
-            f.write(f"CAN Baudrate: {config.CAN_BAUDRATE} бит/с\n")
-            f.write(f"UDS Request ID: 0x{config.UDS_REQUEST_ID:03X}\n")
-            f.write(f"UDS Response ID: 0x{config.UDS_RESPONSE_ID:03X}\n")
-            f.write(f"ISO-TP Timeout: {config.ISO_TP_TIMEOUT} мс\n")
-            f.write(f"UDS Session Timeout: {config.UDS_SESSION_TIMEOUT} мс\n")
-            f.write("\n")
+            parts.append(f"J2534 DLL Path: {config.J2534_DLL_PATH}\n")
+            # EAFP: одна попытка stat вместо exists-проверки (нет окна TOCTOU)
+            try:
+                os.stat(config.J2534_DLL_PATH)
+                dll_exists = True
+            except OSError:
+                dll_exists = False
+            parts.extend((
+                f"DLL существует: {'Да' if dll_exists else 'Нет'}\n",
+                f"CAN Protocol: {config.CAN_PROTOCOL}\n",
+                f"CAN Baudrate: {config.CAN_BAUDRATE} бит/с\n",
+                f"UDS Request ID: 0x{config.UDS_REQUEST_ID:03X}\n",
+                f"UDS Response ID: 0x{config.UDS_RESPONSE_ID:03X}\n",
+                f"ISO-TP Timeout: {config.ISO_TP_TIMEOUT} мс\n",
+                f"UDS Session Timeout: {config.UDS_SESSION_TIMEOUT} мс\n",
+                "\n",
+            ))
             
             # Альтернативные CAN ID
-            f.write("Альтернативные CAN ID пары:\n")
+            parts.append("Альтернативные CAN ID пары:\n")
             for req_id, resp_id in config.ALTERNATIVE_CAN_IDS:
-                f.write(f"  Request=0x{req_id:03X}, Response=0x{resp_id:03X}\n")
-            f.write("\n")
+                parts.append(f"  Request=0x{req_id:03X}, Response=0x{resp_id:03X}\n")
+            parts.append("\n")
             
         except Exception as e:
-            f.write(f"Ошибка чтения конфигурации: {e}\n\n")
+            parts.append(f"Ошибка чтения конфигурации: {e}\n\n")
     
-    def _write_connection_state(self, f, connection_state: Optional[Dict[str, Any]]):
+    def _write_connection_state(self, parts, connection_state: Optional[Dict[str, Any]]):
         """Состояние подключения"""
-        f.write("-"*80 + "\n")
-        f.write("СОСТОЯНИЕ ПОДКЛЮЧЕНИЯ\n")
-        f.write("-"*80 + "\n")
+        parts.append(_HR)
+        parts.append("СОСТОЯНИЕ ПОДКЛЮЧЕНИЯ\n")
+        parts.append(_HR)
         
         if connection_state:
             for key, value in connection_state.items():
-                f.write(f"{key}: {value}\n")
+                parts.append(f"{key}: {value}\n")
         else:
-            f.write("Информация о подключении недоступна\n")
+            parts.append("Информация о подключении недоступна\n")
         
-        f.write("\n")
+        parts.append("\n")
     
-    def _write_error_summary(self, f, error_handler):
+    def _write_error_summary(self, parts, error_handler):
         """Сводка по ошибкам"""
-        f.write("-"*80 + "\n")
-        f.write("СВОДКА ПО ОШИБКАМ\n")
-        f.write("-"*80 + "\n")
+        parts.append(_HR)
+        parts.append("СВОДКА ПО ОШИБКАМ\n")
+        parts.append(_HR)
         
         summary = error_handler.get_error_summary()
         
-        f.write(f"Всего ошибок: {summary['total_errors']}\n")
-        f.write(f"Критических ошибок: {summary['critical_errors']}\n\n")
-        
-        f.write("Ошибки по категориям:\n")
+        parts.extend((
+            f"Всего ошибок: {summary['total_errors']}\n",
+            f"Критических ошибок: {summary['critical_errors']}\n\n",
+            "Ошибки по категориям:\n",
+        ))
         for category, count in summary['errors_by_category'].items():
             if count > 0:
-                f.write(f"  {category.value}: {count}\n")
-        f.write("\n")
+                parts.append(f"  {category}: {count}\n")
+        parts.append("\n")
         
         # Последние ошибки
         if summary['recent_errors']:
-            f.write("Последние ошибки:\n")
+            parts.append("Последние ошибки:\n")
             for err in summary['recent_errors']:
-                f.write(f"  [{err['timestamp']}] {err['severity']} - {err['category']}: {err['message']}\n")
+                parts.append(f"  [{err['timestamp']}] {err['severity']} - {err['category']}: {err['message']}\n")
         
-        f.write("\n")
+        parts.append("\n")
     
-    def _write_operation_context(self, f, operation_context: Optional[Dict[str, Any]]):
+    def _write_operation_context(self, parts, operation_context: Optional[Dict[str, Any]]):
         """Контекст операции"""
-        f.write("-"*80 + "\n")
-        f.write("КОНТЕКСТ ОПЕРАЦИИ\n")
-        f.write("-"*80 + "\n")
-        
-        if operation_context:
-            f.write(json.dumps(operation_context, indent=2, ensure_ascii=False))
-        else:
-            f.write("Контекст операции недоступен\n")
+        parts.append(_HR)
+        parts.append("КОНТЕКСТ ОПЕРАЦИИ\n")
+        parts.append(_HR)
         
-        f.write("\n\n")
+        if not operation_context:
+            parts.append("Контекст операции недоступен\n\n\n")
+            return
+
+        # json импортируется при первом использовании, а не при импорте модуля
+        import json
+
+        # Компактная сериализация вне DEBUG-режима: отступы нужны только
+        # при детальном разборе, а для больших контекстов они заметно дороже
+        try:
+            import config
+            indent = 2 if config.LOG_LEVEL == 'DEBUG' else None
+        except Exception:
+            indent = 2
+        parts.append(json.dumps(operation_context, indent=indent, ensure_ascii=False))
+        parts.append("\n\n")
     
-    def _write_recommendations(self, f, error_handler):
+    def _write_recommendations(self, parts, error_handler):
         """Рекомендации по устранению"""
-        f.write("-"*80 + "\n")
-        f.write("РЕКОМЕНДАЦИИ ПО УСТРАНЕНИЮ ПРОБЛЕМ\n")
-        f.write("-"*80 + "\n")
-        
-        # Анализ ошибок и генерация рекомендаций
+        parts.append(_HR)
+        parts.append("РЕКОМЕНДАЦИИ ПО УСТРАНЕНИЮ ПРОБЛЕМ\n")
+        parts.append(_HR)
+
+        # Анализ ошибок и генерация рекомендаций (O(1) поиск по категории)
         summary = error_handler.get_error_summary()
-        
-        recommendations = []
-        
-        # Рекомендации на основе категорий ошибок
-        for category, count in summary['errors_by_category'].items():
-            if count == 0:
-                continue
-            
-            if category.value == 'hardware':
-                recommendations.append(
-                    "1. ПРОБЛЕМЫ С ОБОРУДОВАНИЕМ:\n"
-                    "   - Проверьте подключение OpenPort 2.0 к USB порту\n"
-                    "   - Убедитесь, что драйверы установлены корректно\n"
-                    "   - Попробуйте другой USB порт\n"
-                    "   - Проверьте, не используется ли адаптер другой программой\n"
-                )
-            
-            elif category.value == 'connection':
-                recommendations.append(
-                    "2. ПРОБЛЕМЫ С ПОДКЛЮЧЕНИЕМ К МОТОЦИКЛУ:\n"
-                    "   - Проверьте 6-pin адаптер H-D → OBD-II подключение\n"
-                    "   - Убедитесь, что адаптер подключен к диагностическому порту мотоцикла\n"
-                    "   - Включите зажигание (без запуска двигателя)\n"
-                    "   - Проверьте правильность распиновки адаптера (CAN H/L на pin 3/4)\n"
-                    "   - Попробуйте запустить с флагом --auto-detect для поиска CAN ID\n"
-                )
-            
-            elif category.value == 'protocol':
-                recommendations.append(
-                    "3. ОШИБКИ ПРОТОКОЛА:\n"
-                    "   - Возможно неправильные CAN ID адреса\n"
-                    "   - Попробуйте автоматический поиск: python main.py --read-vin --auto-detect\n"
-                    "   - Проверьте скорость CAN шины (обычно 500 кбит/с для HDLAN)\n"
-                    "   - Убедитесь, что мотоцикл поддерживает протокол UDS\n"
-                )
-            
-            elif category.value == 'timeout':
-                recommendations.append(
-                    "4. ТАЙМ-АУТЫ:\n"
-                    "   - Увеличьте значения timeout в config.py\n"
-                    "   - Проверьте качество соединения адаптера\n"
-                    "   - Убедитесь, что ЭБУ готов к диагностике (зажигание включено)\n"
-                )
-            
-            elif category.value == 'configuration':
-                recommendations.append(
-                    "5. ПРОБЛЕМЫ С КОНФИГУРАЦИЕЙ:\n"
-                    "   - Проверьте путь к J2534 DLL в config.py\n"
-                    "   - Убедитесь, что все параметры в config.py корректны\n"
-                    "   - Запустите: python check_system.py для проверки системы\n"
-                )
-        
+
+        recommendations = [
+            _RECOMMENDATIONS[category]
+            for category, count in summary['errors_by_category'].items()
+            if count > 0 and category in _RECOMMENDATIONS
+        ]
+
         if not recommendations:
-            f.write("Нет специфических рекомендаций. Система работает нормально.\n")
+            parts.append("Нет специфических рекомендаций. Система работает нормально.\n")
         else:
-            for rec in recommendations:
-                f.write(rec + "\n")
-        
+            parts.append("\n".join(recommendations))
+
         # Общие рекомендации
-        f.write("\nОБЩИЕ РЕКОМЕНДАЦИИ:\n")
-        f.write("- Изучите логи в директории logs/ для детальной информации\n")
-        f.write("- Обратитесь к документации: README.md, QUICKSTART.md\n")
-        f.write("- Используйте --verbose флаг для подробного вывода\n")
-        f.write("- При повторяющихся проблемах - обратитесь к дилеру Harley-Davidson\n")
-        f.write("\n")
-    
-    def _write_footer(self, f):
+        parts.extend((
+            "\nОБЩИЕ РЕКОМЕНДАЦИИ:\n",
+            "- Изучите логи в директории logs/ для детальной информации\n",
+            "- Обратитесь к документации: README.md, QUICKSTART.md\n",
+            "- Используйте --verbose флаг для подробного вывода\n",
+            "- При повторяющихся проблемах - обратитесь к дилеру Harley-Davidson\n",
+            "\n",
+        ))
+
+    def _write_footer(self, parts):
         """Футер отчёта"""
-        f.write("="*80 + "\n")
-        f.write("Конец отчёта\n")
-        f.write("="*80 + "\n")
+        parts.append(_DHR)
+        parts.append("Конец отчёта\n")
+        parts.append(_DHR)
+
+
+# Ленивый доступ к общему экземпляру: объект создаётся только
+# когда кто-то действительно генерирует отчёт
+_reporter = None
 
 
-# Глобальный экземпляр
-global_diagnostic_reporter = DiagnosticReport()
+def get_reporter() -> DiagnosticReport:
+    """Получение общего экземпляра генератора отчётов (создаётся при первом вызове)"""
+    global _reporter
+    if _reporter is None:
+        _reporter = DiagnosticReport()
+    return _reporter
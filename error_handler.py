@@ -4,17 +4,46 @@
 Централизованная система обработки ошибок с автоматической диагностикой
 """
 
+import atexit
+import collections
+import itertools
 import logging
 import traceback
 import datetime
 import os
+import queue
 import sys
+import threading
+import time
+from types import MappingProxyType
 from typing import Optional, Dict, Any, Callable
 from enum import Enum
 import json
 
+# orjson (при наличии) сериализует JSON в разы быстрее stdlib и сразу
+# отдаёт UTF-8; проект работает без внешних зависимостей, поэтому
+# stdlib json остаётся обязательным fallback'ом
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Параметры общего лога критических ошибок
+_CRITICAL_LOG_NAME = "critical_errors.log"
+_CRITICAL_LOG_MAX_BYTES = 10 * 1024 * 1024  # Ротация при 10 МБ
+_CRITICAL_LOG_BUFFER = 64 * 1024
+
+# Компактная запись для сводки: кортеж из четырёх ссылок вместо
+# полного DiagnosticError с details и traceback
+_ErrorSummaryEntry = collections.namedtuple(
+    '_ErrorSummaryEntry', ('timestamp', 'severity', 'category', 'message')
+)
+
+# Общий пустой details: без аллокации словаря на каждую ошибку без контекста
+_EMPTY_DETAILS = MappingProxyType({})
+
 
 class ErrorSeverity(Enum):
     """Уровни критичности ошибок"""
@@ -37,9 +66,19 @@ class ErrorCategory(Enum):
     UNKNOWN = "unknown"             # Неизвестные ошибки
 
 
+# Шаблон нулевых счётчиков: dict.copy() вместо enum-comprehension
+# при каждой инициализации/очистке
+_EMPTY_CATEGORY_COUNTS = {category.value: 0 for category in ErrorCategory}
+
+
 class DiagnosticError(Exception):
     """Базовый класс для всех диагностических ошибок"""
-    
+
+    # Фиксированный набор атрибутов: быстрее доступ и меньше памяти
+    # на экземпляр при заполненном кольцевом буфере истории
+    __slots__ = ("message", "severity", "category", "details",
+                 "recovery_hint", "timestamp_ns", "_exc_info", "_traceback")
+
     def __init__(self, message: str, severity: ErrorSeverity, 
                  category: ErrorCategory, details: Optional[Dict[str, Any]] = None,
                  recovery_hint: Optional[str] = None):
@@ -47,10 +86,34 @@ class DiagnosticError(Exception):
         self.message = message
         self.severity = severity
         self.category = category
-        self.details = details or {}
+        # MappingProxyType: O(1) обёртка без копирования — хранимая ошибка
+        # защищена от мутации контекста вызывающей стороной
+        self.details = MappingProxyType(details) if details else _EMPTY_DETAILS
         self.recovery_hint = recovery_hint
-        self.timestamp = datetime.datetime.now()
-        self.traceback = traceback.format_exc()
+        # time_ns() дешевле конструирования datetime; объект datetime
+        # собирается лениво через свойство timestamp только при выводе
+        self.timestamp_ns = time.time_ns()
+        # Traceback форматируется лениво: format_exc() — дорогой вызов,
+        # а нужен он только при сохранении критического лога. Здесь лишь
+        # запоминаем активное исключение (если оно есть).
+        self._exc_info = sys.exc_info() if sys.exc_info()[0] is not None else None
+        self._traceback = None
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """Момент возникновения ошибки (конструируется по требованию)"""
+        return datetime.datetime.fromtimestamp(self.timestamp_ns / 1e9)
+
+    @property
+    def traceback(self) -> str:
+        """Отформатированный traceback (вычисляется при первом обращении)"""
+        if self._traceback is None:
+            if self._exc_info is not None:
+                self._traceback = ''.join(traceback.format_exception(*self._exc_info))
+                self._exc_info = None  # Кадры стека больше не удерживаются
+            else:
+                self._traceback = ""
+        return self._traceback
 
 
 class ErrorHandler:
@@ -58,17 +121,40 @@ class ErrorHandler:
     
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = log_dir
-        self.error_history = []
-        self.critical_errors = []
+        # Кольцевые буферы фиксированного размера: длинная сессия не
+        # накапливает ошибки (и их traceback'и) безгранично
+        self.error_history = collections.deque(maxlen=1000)
+        self.critical_errors = collections.deque(maxlen=100)
+        # Параллельное кольцо лёгких записей для get_error_summary
+        self._summary_ring = collections.deque(maxlen=1000)
         
         # Создание директории для логов
         os.makedirs(log_dir, exist_ok=True)
         
-        # Счетчики ошибок
-        self.error_counts = {
-            category: 0 for category in ErrorCategory
-        }
-        
+        # Счетчики ошибок (ключ — строковое значение категории: дешевле
+        # хэширования enum-членов и сразу в нужном виде для сводки)
+        self.error_counts = _EMPTY_CATEGORY_COUNTS.copy()
+
+        # Очередь записи критических логов: handle_error не блокируется
+        # на файловом I/O, запись выполняет фоновый daemon-поток.
+        # Все записи идут в один общий буферизованный append-файл —
+        # один open() на процесс вместо open()+close() на каждую ошибку
+        self._critical_log = None  # Открывается лениво при первой записи
+        self._write_queue = queue.Queue(maxsize=1024)
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop, daemon=True, name="ErrorLogWriter"
+        )
+        self._writer_thread.start()
+
+        # Асинхронная диспетчеризация ошибок с горячих путей: вызывающий
+        # поток лишь кладёт кортеж в SimpleQueue (lock-free put), всю
+        # классификацию и логирование выполняет фоновый поток
+        self._async_queue = queue.SimpleQueue()
+        self._async_thread = threading.Thread(
+            target=self._async_loop, daemon=True, name="ErrorDispatch"
+        )
+        self._async_thread.start()
+
         logger.info("ErrorHandler инициализирован")
     
     def handle_error(self, error: Exception, 
@@ -92,85 +178,182 @@ class ErrorHandler:
         
         # Добавление в историю
         self.error_history.append(diag_error)
-        self.error_counts[category] += 1
-        
-        # Логирование
-        log_msg = f"[{diag_error.category.value.upper()}] {diag_error.message}"
+        self._summary_ring.append(_ErrorSummaryEntry(
+            diag_error.timestamp_ns, diag_error.severity,
+            diag_error.category, diag_error.message
+        ))
+        self.error_counts[category.value] += 1
         
+        # Логирование (%-аргументы форматируются только при эмиссии записи)
         if severity == ErrorSeverity.FATAL or severity == ErrorSeverity.CRITICAL:
             self.critical_errors.append(diag_error)
-            logger.critical(log_msg)
+            logger.critical("[%s] %s", diag_error.category.value.upper(), diag_error.message)
             self._save_critical_error_log(diag_error)
         elif severity == ErrorSeverity.RECOVERABLE:
-            logger.error(log_msg)
+            logger.error("[%s] %s", diag_error.category.value.upper(), diag_error.message)
         elif severity == ErrorSeverity.WARNING:
-            logger.warning(log_msg)
+            logger.warning("[%s] %s", diag_error.category.value.upper(), diag_error.message)
         else:
-            logger.info(log_msg)
+            logger.info("[%s] %s", diag_error.category.value.upper(), diag_error.message)
         
         # Вывод подсказки по восстановлению
         if diag_error.recovery_hint:
-            logger.info(f"💡 Подсказка: {diag_error.recovery_hint}")
+            logger.info("💡 Подсказка: %s", diag_error.recovery_hint)
         
         return diag_error
     
+    def handle_error_async(self, error: Exception,
+                           severity: ErrorSeverity = ErrorSeverity.RECOVERABLE,
+                           category: ErrorCategory = ErrorCategory.UNKNOWN,
+                           context: Optional[Dict[str, Any]] = None,
+                           recovery_hint: Optional[str] = None):
+        """Постановка ошибки в очередь фоновой обработки
+
+        Для горячих путей (шквал NRC 0x78, таймауты сканирования):
+        вызывающий поток не блокируется на форматировании и логировании.
+        """
+        self._async_queue.put((error, severity, category, context, recovery_hint))
+
+    def _async_loop(self):
+        """Фоновый поток обработки ошибок, поставленных handle_error_async"""
+        while True:
+            error, severity, category, context, recovery_hint = self._async_queue.get()
+            try:
+                self.handle_error(error, severity=severity, category=category,
+                                  context=context, recovery_hint=recovery_hint)
+            except Exception as e:
+                logger.error("Ошибка асинхронной обработки: %s", e)
+
     def _save_critical_error_log(self, error: DiagnosticError):
-        """Автоматическое сохранение лога критической ошибки"""
+        """Постановка лога критической ошибки в очередь фоновой записи"""
         try:
-            timestamp = error.timestamp.strftime("%Y%m%d_%H%M%S")
-            filename = f"critical_error_{timestamp}.log"
-            filepath = os.path.join(self.log_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("="*80 + "\n")
-                f.write(f"КРИТИЧЕСКАЯ ОШИБКА - {error.timestamp}\n")
-                f.write("="*80 + "\n\n")
-                
-                f.write(f"Категория: {error.category.value.upper()}\n")
-                f.write(f"Серьёзность: {error.severity.name}\n")
-                f.write(f"Сообщение: {error.message}\n\n")
-                
-                if error.recovery_hint:
-                    f.write(f"Подсказка по восстановлению:\n{error.recovery_hint}\n\n")
-                
-                if error.details:
-                    f.write("Детали:\n")
-                    f.write(json.dumps(error.details, indent=2, ensure_ascii=False))
-                    f.write("\n\n")
-                
-                f.write("Traceback:\n")
-                f.write(error.traceback)
-                f.write("\n")
-            
-            logger.info(f"Лог критической ошибки сохранён: {filepath}")
-            
+            parts = [
+                "=" * 80 + "\n",
+                f"КРИТИЧЕСКАЯ ОШИБКА - {error.timestamp}\n",
+                "=" * 80 + "\n\n",
+                f"Категория: {error.category.value.upper()}\n",
+                f"Серьёзность: {error.severity.name}\n",
+                f"Сообщение: {error.message}\n\n",
+            ]
+
+            if error.recovery_hint:
+                parts.append(f"Подсказка по восстановлению:\n{error.recovery_hint}\n\n")
+
+            if error.details:
+                parts.append("Детали:\n")
+                if orjson is not None:
+                    parts.append(orjson.dumps(dict(error.details),
+                                              option=orjson.OPT_INDENT_2).decode('utf-8'))
+                else:
+                    parts.append(json.dumps(dict(error.details), indent=2, ensure_ascii=False))
+                parts.append("\n\n")
+
+            parts.append("Traceback:\n")
+            parts.append(error.traceback)
+            parts.append("\n")
+
+            # Drop-on-full: при шторме критических ошибок лучше потерять
+            # запись лога, чем заблокировать обработку ошибок
+            try:
+                self._write_queue.put_nowait((error.severity, ''.join(parts)))
+            except queue.Full:
+                logger.warning("Очередь записи логов переполнена, запись отброшена")
+
         except Exception as e:
-            logger.error(f"Не удалось сохранить лог критической ошибки: {e}")
+            logger.error("Не удалось сохранить лог критической ошибки: %s", e)
+
+    def _ensure_critical_log(self):
+        """Ленивое открытие общего лога критических ошибок (с ротацией по размеру)"""
+        path = os.path.join(self.log_dir, _CRITICAL_LOG_NAME)
+
+        if self._critical_log is not None:
+            if self._critical_log.tell() < _CRITICAL_LOG_MAX_BYTES:
+                return self._critical_log
+            # Ротация: текущий файл становится .1, пишем в новый
+            self._critical_log.close()
+            self._critical_log = None
+            os.replace(path, path + ".1")
+
+        self._critical_log = open(path, 'a', buffering=_CRITICAL_LOG_BUFFER,
+                                  encoding='utf-8')
+        return self._critical_log
+
+    def _writer_loop(self):
+        """Фоновый поток записи критических логов"""
+        while True:
+            item = self._write_queue.get()
+            try:
+                if item is None:  # Сигнал завершения
+                    return
+                severity, payload = item
+                try:
+                    f = self._ensure_critical_log()
+                    f.write(payload)
+                    # FATAL сбрасывается на диск немедленно; шквал CRITICAL
+                    # агрегируется в буфере записи
+                    if severity == ErrorSeverity.FATAL:
+                        f.flush()
+                except Exception as e:
+                    logger.error("Ошибка фоновой записи лога: %s", e)
+            finally:
+                self._write_queue.task_done()
+
+    def flush(self):
+        """Ожидание записи всех поставленных в очередь логов"""
+        self._write_queue.join()
+        if self._critical_log is not None:
+            try:
+                self._critical_log.flush()
+            except ValueError:
+                pass  # Файл уже закрыт
+
+    def close(self):
+        """Остановка фонового потока записи (с дозаписью очереди)"""
+        self.flush()
+        self._write_queue.put(None)
+        self._writer_thread.join(timeout=5.0)
+        if self._critical_log is not None:
+            self._critical_log.close()
+            self._critical_log = None
     
     def retry_with_recovery(self, func: Callable, max_attempts: int = 3,
-                           initial_delay: float = 1.0, 
+                           initial_delay: float = 1.0,
                            backoff_factor: float = 2.0,
+                           max_delay: float = 30.0,
+                           jitter: float = 0.5,
                            error_category: ErrorCategory = ErrorCategory.UNKNOWN,
-                           recovery_callback: Optional[Callable] = None) -> Any:
-        """Выполнение функции с автоматическим retry и exponential backoff"""
+                           recovery_callback: Optional[Callable] = None,
+                           unrecoverable_exceptions: tuple = ()) -> Any:
+        """Выполнение функции с автоматическим retry и exponential backoff
+
+        Задержка растёт экспоненциально с ограничением max_delay и
+        мультипликативным jitter — несколько клиентов, упёршихся в одну
+        и ту же ошибку (занятая шина, выдернутый адаптер), не повторяют
+        запросы синхронно. Исключения из unrecoverable_exceptions
+        пробрасываются сразу без повторных попыток.
+        """
+        import random
         import time
-        
+
         last_error = None
         delay = initial_delay
-        
+
         for attempt in range(1, max_attempts + 1):
             try:
-                logger.info(f"Попытка {attempt}/{max_attempts}: {func.__name__}")
+                logger.info("Попытка %d/%d: %s", attempt, max_attempts, func.__name__)
                 result = func()
-                
+
                 if attempt > 1:
-                    logger.info(f"✅ Успешно после {attempt} попыток")
-                
+                    logger.info("✅ Успешно после %d попыток", attempt)
+
                 return result
-                
+
+            except unrecoverable_exceptions:
+                # Невосстановимая ошибка — retry бессмыслен
+                raise
             except Exception as e:
                 last_error = e
-                
+
                 severity = ErrorSeverity.RECOVERABLE if attempt < max_attempts else ErrorSeverity.CRITICAL
                 
                 diag_error = self.handle_error(
@@ -181,9 +364,9 @@ class ErrorHandler:
                 )
                 
                 if attempt < max_attempts:
-                    logger.warning(f"⏳ Повтор через {delay:.1f} секунд...")
+                    logger.warning("⏳ Повтор через %.1f секунд...", delay)
                     time.sleep(delay)
-                    delay *= backoff_factor
+                    delay = min(max_delay, delay * backoff_factor) * (1 + random.uniform(-jitter, jitter))
                     
                     # Вызов callback для восстановления если есть
                     if recovery_callback:
@@ -191,7 +374,7 @@ class ErrorHandler:
                             logger.info("Вызов recovery callback...")
                             recovery_callback()
                         except Exception as recovery_error:
-                            logger.error(f"Ошибка в recovery callback: {recovery_error}")
+                            logger.error("Ошибка в recovery callback: %s", recovery_error)
         
         # Все попытки исчерпаны
         raise DiagnosticError(
@@ -209,12 +392,14 @@ class ErrorHandler:
             "errors_by_category": self.error_counts,
             "recent_errors": [
                 {
-                    "timestamp": e.timestamp.isoformat(),
+                    "timestamp": datetime.datetime.fromtimestamp(e.timestamp / 1e9).isoformat(),
                     "severity": e.severity.name,
                     "category": e.category.value,
                     "message": e.message
                 }
-                for e in self.error_history[-10:]  # Последние 10
+                for e in itertools.islice(self._summary_ring,
+                                          max(0, len(self._summary_ring) - 10),
+                                          None)  # Последние 10
             ]
         }
     
@@ -222,9 +407,13 @@ class ErrorHandler:
         """Очистка истории ошибок"""
         self.error_history.clear()
         self.critical_errors.clear()
-        self.error_counts = {category: 0 for category in ErrorCategory}
+        self._summary_ring.clear()
+        self.error_counts = _EMPTY_CATEGORY_COUNTS.copy()
         logger.info("История ошибок очищена")
 
 
 # Глобальный экземпляр для использования во всех модулях
 global_error_handler = ErrorHandler()
+
+# Гарантированная дозапись очереди и закрытие лога при завершении процесса
+atexit.register(global_error_handler.close)
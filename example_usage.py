@@ -13,18 +13,14 @@ import os
 # Добавление текущей директории в PYTHONPATH
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from harley_diagnostics import HarleyDiagnostics
-import logging
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Тяжёлый стек диагностики (ctypes, обработчики протоколов) импортируется
+# лениво внутри примеров: запуск меню не трогает аппаратные модули
 
 
 def example_basic_usage():
     """Базовый пример: чтение VIN"""
+    from harley_diagnostics import HarleyDiagnostics
+
     print("\n" + "="*60)
     print("ПРИМЕР 1: Базовое использование - чтение VIN")
     print("="*60)
@@ -52,6 +48,8 @@ def example_basic_usage():
 
 def example_with_context_manager():
     """Пример с использованием контекстного менеджера"""
+    from harley_diagnostics import HarleyDiagnostics
+
     print("\n" + "="*60)
     print("ПРИМЕР 2: Использование with (context manager)")
     print("="*60)
@@ -71,6 +69,8 @@ def example_with_context_manager():
 
 def example_scan_odometer():
     """Пример: сканирование для поиска одометра"""
+    from harley_diagnostics import HarleyDiagnostics
+
     print("\n" + "="*60)
     print("ПРИМЕР 3: Сканирование DIDs для поиска одометра")
     print("="*60)
@@ -92,6 +92,8 @@ def example_scan_odometer():
 
 def example_read_specific_odometer():
     """Пример: чтение конкретного DID одометра"""
+    from harley_diagnostics import HarleyDiagnostics
+
     print("\n" + "="*60)
     print("ПРИМЕР 4: Чтение конкретного одометра")
     print("="*60)
@@ -169,6 +171,7 @@ def example_error_handling():
     print("ПРИМЕР 6: Обработка ошибок")
     print("="*60)
     
+    from harley_diagnostics import HarleyDiagnostics
     from j2534_wrapper import J2534Exception
     from uds_client import UDSException
     
@@ -193,6 +196,14 @@ def example_error_handling():
 
 def main():
     """Главная функция - запуск всех примеров"""
+    import logging
+
+    # Настройка логирования
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
     print("\n")
     print("╔" + "="*58 + "╗")
     print("║  Примеры использования Harley-Davidson Diagnostic Tool  ║")
@@ -211,7 +222,11 @@ def main():
     for num, desc, _ in examples:
         print(f"  {num}. {desc}")
     print("  0. Выход")
-    
+
+    # Таблица диспетчеризации строится один раз: O(1) поиск по выбору
+    # вместо линейного прохода по списку примеров на каждой итерации
+    dispatch = {num: func for num, _, func in examples}
+
     while True:
         try:
             choice = input("\nВыберите пример (0-6): ").strip()
@@ -220,26 +235,21 @@ def main():
                 print("\n👋 До свидания!")
                 break
             
-            # Поиск и запуск примера
-            found = False
-            for num, desc, func in examples:
-                if choice == num:
-                    try:
-                        func()
-                        found = True
-                    except KeyboardInterrupt:
-                        print("\n\n⚠️ Прервано пользователем")
-                        break
-                    except Exception as e:
-                        print(f"\n❌ Ошибка при выполнении примера: {e}")
-                        import traceback
-                        traceback.print_exc()
-                    
-                    input("\nНажмите Enter для продолжения...")
-                    break
-            
-            if not found:
+            func = dispatch.get(choice)
+            if func is None:
                 print("❌ Неверный выбор. Попробуйте снова.")
+                continue
+
+            try:
+                func()
+            except KeyboardInterrupt:
+                print("\n\n⚠️ Прервано пользователем")
+            except Exception as e:
+                print(f"\n❌ Ошибка при выполнении примера: {e}")
+                import traceback
+                traceback.print_exc()
+
+            input("\nНажмите Enter для продолжения...")
         
         except KeyboardInterrupt:
             print("\n\n👋 До свидания!")
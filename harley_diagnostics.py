@@ -1,5 +1,8 @@
 """Harley-Davidson XG750A диагностика через HDLAN/UDS"""
+import functools
 import logging
+import random
+import struct
 import time
 from typing import Optional, Dict, Any, List
 
@@ -8,13 +11,87 @@ from j2534_wrapper import J2534Wrapper
 from isotp_handler import ISOTPHandler
 from uds_client import UDSClient, EXTENDED_DIAGNOSTIC_SESSION
 from error_handler import global_error_handler, ErrorSeverity, ErrorCategory, DiagnosticError
-from diagnostic_report import global_diagnostic_reporter
+from diagnostic_report import get_reporter
+
+# Опциональная зависимость: векторизация пакетного анализа одометра.
+# Без numpy используется эквивалентный чистый Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 logger = logging.getLogger(__name__)
 
+# Предкомпилированный распаковщик для анализа одометра:
+# struct.Struct заметно быстрее int.from_bytes и не аллоцирует срезы
+_U32 = struct.Struct(">I")
+
+# Символы, недопустимые в VIN (I, O, Q); frozenset.isdisjoint проверяет
+# строку одним C-проходом без .upper()-аллокации и Python-цикла
+_VIN_INVALID_CHARS = frozenset('IOQioq')
+# Та же проверка на сырых байтах — до decode(), без строковых аллокаций
+_VIN_INVALID_BYTES = frozenset(b'IOQioq')
+
+# S3-таймаут UDS: сколько ЭБУ удерживает не-дефолтную сессию без TesterPresent
+_S3_TIMEOUT = 5.0
+
+# Файл с параметрами, найденными экспериментально (CAN ID, DID одометра)
+_PARAMS_FILE = 'discovered_params.txt'
+
+# Диапазон правдоподобного пробега в км: меньше 100 км бывает только у
+# мотоцикла с завода, больше 300 000 км — практически никогда
+_PLAUSIBLE_KM_RANGE = (100.0, 300000.0)
+
+# Размер пакета multi-DID запроса 0x22 при сканировании: 8 DID — это
+# 17 байт полезной нагрузки, один короткий ISO-TP multi-frame запрос
+_SCAN_BATCH_SIZE = 8
+
+
+@functools.lru_cache(maxsize=None)
+def _did_hex(did: int) -> str:
+    """Мемоизированное "0xF190"-представление DID: DID-ов не более 65536,
+    а строки нужны в каждой строке лога при повторных сканированиях"""
+    return f"0x{did:04X}"
+
+# Кандидатные коэффициенты пересчёта сырого значения в км:
+# 1, 0.1, 0.01 и те же для значения в милях (×0.621371)
+_ODOMETER_SCALES = (1.0, 0.1, 0.01, 0.621371, 0.0621371)
+
+
+class _Interpretation:
+    """Лениво форматируемая интерпретация значения одометра
+
+    Строка собирается только при фактическом выводе (str()/лог):
+    при подавленном логировании сканирование тысяч DID не платит
+    за %-форматирование шести строк на каждый ответ.
+    """
+    __slots__ = ('_fmt', '_args')
+
+    def __init__(self, fmt, *args):
+        self._fmt = fmt
+        self._args = args
+
+    def __str__(self):
+        return self._fmt % self._args
+
+    __repr__ = __str__
+
 
 class HarleyDiagnostics:
     """Основной класс для диагностики Harley-Davidson"""
+
+    # Стандартные DID для read_ecu_info: таблица строится один раз на
+    # класс, а не при каждом вызове
+    _ECU_INFO_DIDS = {
+        0xF18C: 'ECU Serial Number',
+        0xF190: 'VIN',
+        0xF191: 'Hardware Number',
+        0xF192: 'Software Number',
+        0xF194: 'Supplier ID',
+        0xF195: 'Date of Manufacture',
+        0xF197: 'System Name',
+        0xF19E: 'Active Diagnostic Session'
+    }
     
     def __init__(self, auto_detect_can_ids: bool = False):
         self.j2534 = None
@@ -23,20 +100,43 @@ class HarleyDiagnostics:
         self.connected = False
         self.auto_detect_can_ids = auto_detect_can_ids
         self.working_can_ids = None  # (request_id, response_id)
+        # Кэш рабочих CAN ID с прошлого запуска: автопоиск превращается
+        # в одну верификацию вместо полного перебора кандидатов
+        self._cached_can_ids = self._load_cached_can_ids()
+        # Кэш состояния диагностической сессии: при быстром reconnect ЭБУ
+        # ещё в расширенной сессии, повторный 0x10 round-trip не нужен
+        self._current_session = None
+        self._last_session_activity = 0.0
+        # VIN неизменяем на протяжении сессии — читается с ЭБУ один раз
+        self._vin_cache = None
+        # Горячие пути обращаются к DID VIN через атрибут экземпляра:
+        # один lookup в __init__ вместо двух (config + DIDS) на каждый вызов
+        self._vin_did = config.DIDS['VIN']
         
         logger.info("Инициализация Harley Diagnostics")
     
+    def _attempts(self):
+        """Итератор попыток подключения
+
+        Инкапсулирует ритм retry-цикла: после каждой неудачной (не
+        последней) попытки — backoff-пауза и очистка состояния. При
+        успехе вызывающий код просто выходит из цикла, и генератор
+        не делает ни паузы, ни disconnect.
+        """
+        max_attempts = config.MAX_RETRY_ATTEMPTS
+        for attempt in range(1, max_attempts + 1):
+            yield attempt, max_attempts
+            # Управление возвращается сюда только после неудачной попытки
+            if attempt < max_attempts:
+                self._sleep_backoff(attempt)
+                self.disconnect()  # Очистка перед повтором
+
     def connect(self) -> bool:
         """Подключение к мотоциклу с автоматической диагностикой и восстановлением"""
-        connection_attempts = 0
-        max_connection_attempts = config.MAX_RETRY_ATTEMPTS
-        
-        while connection_attempts < max_connection_attempts:
-            connection_attempts += 1
-            
+        for attempt, max_attempts in self._attempts():
             try:
                 logger.info("="*60)
-                logger.info(f"Начало подключения к Harley-Davidson XG750A (попытка {connection_attempts}/{max_connection_attempts})")
+                logger.info("Начало подключения к Harley-Davidson XG750A (попытка %d/%d)", attempt, max_attempts)
                 logger.info("="*60)
                 
                 # Предварительная диагностика
@@ -66,22 +166,39 @@ class HarleyDiagnostics:
                 # Запуск фонового чтения
                 self.j2534.start_reading()
                 
-                # Очистка буферов
-                time.sleep(0.2)
-                self.j2534.clear_buffers()
+                # Очистка буферов (по затишью на шине, без фиксированной паузы)
+                self.j2534.wait_buffers_clear()
                 
-                # Инициализация ISO-TP и UDS
+                # Инициализация ISO-TP и UDS (экземпляры переживают
+                # повторные попытки: reset вместо создания заново)
                 logger.info("🔗 Инициализация протоколов ISO-TP и UDS...")
-                self.isotp = ISOTPHandler(self.j2534, request_id, response_id)
-                self.uds = UDSClient(self.isotp)
+                if self.isotp is None:
+                    self.isotp = ISOTPHandler(self.j2534, request_id, response_id)
+                else:
+                    self.isotp.j2534 = self.j2534
+                    self.isotp.reset(request_id, response_id)
+                if self.uds is None:
+                    self.uds = UDSClient(self.isotp)
                 
                 # Переключение в расширенную диагностическую сессию
-                logger.info("🔐 Переключение в Extended Diagnostic Session...")
-                session_success = False
-                try:
-                    session_success = self.uds.diagnostic_session_control(EXTENDED_DIAGNOSTIC_SESSION)
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка переключения сессии: {e}")
+                # (пропускается, если после быстрого reconnect ЭБУ ещё
+                # удерживает её в пределах S3-таймаута)
+                if (self._current_session == EXTENDED_DIAGNOSTIC_SESSION
+                        and time.monotonic() - self._last_session_activity < _S3_TIMEOUT):
+                    logger.info("🔐 Extended Diagnostic Session ещё активна, переключение пропущено")
+                    self.uds.current_session = EXTENDED_DIAGNOSTIC_SESSION
+                    session_success = True
+                else:
+                    logger.info("🔐 Переключение в Extended Diagnostic Session...")
+                    session_success = False
+                    try:
+                        session_success = self.uds.diagnostic_session_control(EXTENDED_DIAGNOSTIC_SESSION)
+                    except Exception as e:
+                        logger.warning("⚠️ Ошибка переключения сессии: %s", e)
+
+                if session_success:
+                    self._current_session = EXTENDED_DIAGNOSTIC_SESSION
+                    self._last_session_activity = time.monotonic()
                 
                 if not session_success:
                     logger.warning("⚠️ Не удалось переключиться в расширенную сессию, продолжаем в стандартной")
@@ -106,44 +223,45 @@ class HarleyDiagnostics:
                 self.connected = True
                 logger.info("="*60)
                 logger.info("✅ ПОДКЛЮЧЕНИЕ УСПЕШНО!")
-                logger.info(f"   CAN ID: Request=0x{request_id:03X}, Response=0x{response_id:03X}")
+                logger.info("   CAN ID: Request=0x%03X, Response=0x%03X", request_id, response_id)
                 logger.info("="*60)
                 
                 return True
                 
-            except DiagnosticError as e:
-                logger.error(f"❌ Диагностическая ошибка подключения: {e.message}")
-                global_error_handler.handle_error(e, severity=e.severity, category=e.category)
-                
-                if connection_attempts < max_connection_attempts:
-                    delay = config.RETRY_INITIAL_DELAY * (config.RETRY_BACKOFF_FACTOR ** (connection_attempts - 1))
-                    logger.info(f"⏳ Повтор подключения через {delay:.1f} секунд...")
-                    time.sleep(delay)
-                    self.disconnect()  # Очистка перед повтором
-                else:
-                    self._generate_connection_failure_report(e)
-                    
             except Exception as e:
-                logger.error(f"❌ Неожиданная ошибка подключения: {e}")
-                global_error_handler.handle_error(
-                    e,
-                    severity=ErrorSeverity.CRITICAL,
-                    category=ErrorCategory.CONNECTION
-                )
-                
-                if connection_attempts < max_connection_attempts:
-                    delay = config.RETRY_INITIAL_DELAY * (config.RETRY_BACKOFF_FACTOR ** (connection_attempts - 1))
-                    logger.info(f"⏳ Повтор подключения через {delay:.1f} секунд...")
-                    time.sleep(delay)
-                    self.disconnect()
+                self._current_session = None  # Состояние сессии недостоверно
+                # Единая ветка обработки: только severity/category зависят
+                # от типа исключения
+                if isinstance(e, DiagnosticError):
+                    logger.error("❌ Диагностическая ошибка подключения: %s", e.message)
+                    severity, category = e.severity, e.category
                 else:
+                    logger.error("❌ Неожиданная ошибка подключения: %s", e)
+                    severity, category = ErrorSeverity.CRITICAL, ErrorCategory.CONNECTION
+                global_error_handler.handle_error(e, severity=severity, category=category)
+                
+                if attempt == max_attempts:
                     self._generate_connection_failure_report(e)
         
         # Все попытки исчерпаны
-        logger.error(f"❌ Не удалось подключиться после {max_connection_attempts} попыток")
+        logger.error("❌ Не удалось подключиться после %d попыток", config.MAX_RETRY_ATTEMPTS)
         self.disconnect()
         return False
     
+    @staticmethod
+    def _sleep_backoff(attempt: int):
+        """Пауза перед повторной попыткой подключения
+
+        Exponential backoff с потолком RETRY_MAX_DELAY и джиттером
+        ±50%: при нескольких одновременно запущенных инструментах
+        повторы не синхронизируются и не бьют по шине залпом.
+        """
+        delay = min(config.RETRY_MAX_DELAY,
+                    config.RETRY_INITIAL_DELAY * (config.RETRY_BACKOFF_FACTOR ** (attempt - 1)))
+        delay *= random.uniform(0.5, 1.5)
+        logger.info("⏳ Повтор подключения через %.1f секунд...", delay)
+        time.sleep(delay)
+
     def _pre_connection_diagnostics(self):
         """Предварительная диагностика перед подключением"""
         logger.info("🔍 Выполнение предварительной диагностики...")
@@ -157,17 +275,69 @@ class HarleyDiagnostics:
                 category=ErrorCategory.CONFIGURATION,
                 recovery_hint="Установите драйверы OpenPort 2.0 или укажите путь к DLL в config.py"
             )
-        logger.info(f"✅ J2534 DLL найден: {dll_path}")
+        logger.info("✅ J2534 DLL найден: %s", dll_path)
     
+    @staticmethod
+    def _load_cached_can_ids() -> Optional[tuple]:
+        """Чтение кэшированных CAN ID из файла найденных параметров"""
+        try:
+            request_id = response_id = None
+            with open(_PARAMS_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('UDS_REQUEST_ID'):
+                        request_id = int(line.split('=')[1].strip(), 16)
+                    elif line.startswith('UDS_RESPONSE_ID'):
+                        response_id = int(line.split('=')[1].strip(), 16)
+            if request_id is not None and response_id is not None:
+                return (request_id, response_id)
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def _save_cached_can_ids(self, request_id: int, response_id: int):
+        """Кэширование рабочих CAN ID для следующих запусков
+
+        Остальное содержимое файла (параметры одометра) сохраняется.
+        """
+        try:
+            try:
+                with open(_PARAMS_FILE, 'r', encoding='utf-8') as f:
+                    lines = [line for line in f
+                             if not line.startswith(('UDS_REQUEST_ID', 'UDS_RESPONSE_ID'))]
+            except OSError:
+                lines = ["# Найденные параметры для Harley-Davidson\n",
+                         "# Скопируйте эти значения в config.py\n\n"]
+
+            lines.append(f"UDS_REQUEST_ID = 0x{request_id:03X}\n")
+            lines.append(f"UDS_RESPONSE_ID = 0x{response_id:03X}\n")
+
+            with open(_PARAMS_FILE, 'w', encoding='utf-8') as f:
+                f.write(''.join(lines))
+            logger.info("💾 Рабочие CAN ID закэшированы в %s", _PARAMS_FILE)
+        except Exception as e:
+            logger.warning("⚠️ Не удалось закэшировать CAN ID: %s", e)
+
     def _determine_can_ids(self) -> tuple:
         """Определение рабочих CAN ID"""
         if self.auto_detect_can_ids:
+            # Сначала верификация кэшированной пары: один короткий VIN-зонд
+            # вместо полного автопоиска (типичный connect с ~5 с до ~1 с)
+            if self._cached_can_ids:
+                logger.info("💾 Проверка кэшированных CAN ID: Request=0x%03X, Response=0x%03X",
+                            *self._cached_can_ids)
+                if self._probe_pairs([self._cached_can_ids], window=0.5):
+                    logger.info("✅ Кэшированные CAN ID подтверждены")
+                    self.working_can_ids = self._cached_can_ids
+                    return self._cached_can_ids
+                logger.info("Кэшированная пара не ответила, запускаем полный автопоиск")
+
             logger.info("🔎 Автоматический поиск рабочих CAN ID...")
             can_ids = self._find_working_can_ids()
             if can_ids:
                 request_id, response_id = can_ids
-                logger.info(f"✅ Найдены рабочие CAN ID: Request=0x{request_id:03X}, Response=0x{response_id:03X}")
+                logger.info("✅ Найдены рабочие CAN ID: Request=0x%03X, Response=0x%03X", request_id, response_id)
                 self.working_can_ids = can_ids
+                self._save_cached_can_ids(request_id, response_id)
                 return can_ids
             else:
                 logger.warning("⚠️ Автопоиск не дал результатов, используем стандартные CAN ID")
@@ -181,7 +351,7 @@ class HarleyDiagnostics:
         # Использование стандартных ID
         request_id = config.UDS_REQUEST_ID
         response_id = config.UDS_RESPONSE_ID
-        logger.info(f"📋 Используем стандартные CAN ID: Request=0x{request_id:03X}, Response=0x{response_id:03X}")
+        logger.info("📋 Используем стандартные CAN ID: Request=0x%03X, Response=0x%03X", request_id, response_id)
         return (request_id, response_id)
     
     def _verify_connection(self) -> bool:
@@ -190,7 +360,9 @@ class HarleyDiagnostics:
         
         try:
             # Попытка прочитать VIN для проверки
-            test_data = self.uds.read_data_by_identifier(config.DIDS['VIN'])
+            # Короткий таймаут: при исправной связи VIN приходит быстро,
+            # а при неисправной нет смысла ждать полные 2 секунды
+            test_data = self.uds.read_data_by_identifier(self._vin_did, timeout=500)
             if test_data and len(test_data) == 17:
                 logger.info("✅ Связь с ЭБУ подтверждена")
                 return True
@@ -198,7 +370,7 @@ class HarleyDiagnostics:
                 logger.warning("⚠️ Связь установлена, но ответ от ЭБУ некорректен")
                 return False
         except Exception as e:
-            logger.error(f"❌ Ошибка проверки связи: {e}")
+            logger.error("❌ Ошибка проверки связи: %s", e)
             return False
     
     def _generate_connection_failure_report(self, error: Exception):
@@ -217,53 +389,96 @@ class HarleyDiagnostics:
                     "attempts": config.MAX_RETRY_ATTEMPTS
                 }
                 
-                report_path = global_diagnostic_reporter.generate_report(
+                report_path = get_reporter().generate_report(
                     global_error_handler,
                     connection_state=connection_state,
                     operation_context=operation_context
                 )
                 
                 if report_path:
-                    logger.info(f"📄 Диагностический отчёт сохранён: {report_path}")
+                    logger.info("📄 Диагностический отчёт сохранён: %s", report_path)
                     print(f"\n📄 Диагностический отчёт сохранён: {report_path}")
                     print("   Изучите отчёт для получения рекомендаций по устранению проблемы.\n")
             except Exception as report_error:
-                logger.error(f"Ошибка генерации отчёта: {report_error}")
+                logger.error("Ошибка генерации отчёта: %s", report_error)
     
     def _find_working_can_ids(self) -> Optional[tuple]:
-        """Автоматический поиск рабочих CAN ID"""
-        logger.info("Проверка CAN ID пар...")
-        
-        for request_id, response_id in config.ALTERNATIVE_CAN_IDS:
-            logger.info(f"Пробуем: Request=0x{request_id:03X}, Response=0x{response_id:03X}")
-            
+        """Автоматический поиск рабочих CAN ID (параллельный опрос)
+
+        Вместо последовательного перебора пар (фильтр + полный UDS-запрос
+        + таймаут на каждую) фильтры устанавливаются для всех кандидатов
+        сразу, VIN-запрос рассылается на все request_id подряд, а ответы
+        сопоставляются по арбитражному CAN ID по мере поступления.
+        """
+        logger.info("Проверка CAN ID пар (параллельный опрос)...")
+        candidates = list(config.ALTERNATIVE_CAN_IDS)
+        # Пара, сработавшая в прошлый раз, проверяется первой и в полном
+        # переборе: её запрос уходит раньше остальных
+        if self._cached_can_ids in candidates:
+            candidates.remove(self._cached_can_ids)
+            candidates.insert(0, self._cached_can_ids)
+        return self._probe_pairs(candidates, window=0.3)
+
+    def _probe_pairs(self, candidates: List[tuple], window: float = 0.3) -> Optional[tuple]:
+        """VIN-зонд списка пар CAN ID с корреляцией ответов по арбитражному ID"""
+        try:
+            self.j2534.set_multiple_flow_control_filters(candidates)
+
+            # Запуск чтения
+            if not self.j2534._read_thread or not self.j2534._read_thread.is_alive():
+                self.j2534.start_reading()
+
+            # Ожидание затишья вместо фиксированных пауз
+            self.j2534.wait_buffers_clear()
+
+            # Single Frame запрос VIN (0x22 F1 90)
+            vin_did = self._vin_did
+            probe = bytes([0x03, 0x22, vin_did >> 8, vin_did & 0xFF, 0, 0, 0, 0])
+
+            # Сначала один функциональный broadcast (0x7DF): любой ЭБУ с
+            # установленным фильтром ответит, per-candidate рассылка ниже
+            # остаётся для нестандартных физических адресов
             try:
-                # Временная установка фильтра
-                self.j2534.set_flow_control_filter(request_id, response_id)
-                time.sleep(0.1)
-                
-                # Запуск чтения
-                if not self.j2534._read_thread or not self.j2534._read_thread.is_alive():
-                    self.j2534.start_reading()
-                
-                time.sleep(0.2)
-                self.j2534.clear_buffers()
-                
-                # Создание временных обработчиков
-                temp_isotp = ISOTPHandler(self.j2534, request_id, response_id)
-                temp_uds = UDSClient(temp_isotp)
-                
-                # Попытка прочитать VIN
-                vin_data = temp_uds.read_data_by_identifier(config.DIDS['VIN'])
-                
-                if vin_data and len(vin_data) == 17:
-                    logger.info(f"✅ Успех! Найдены рабочие CAN ID")
-                    return (request_id, response_id)
-                
+                self.j2534.write_message(0x7DF, probe)
             except Exception as e:
-                logger.debug(f"Не подошло: {e}")
-                continue
-        
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Broadcast-запрос не отправлен: %s", e)
+
+            for request_id, _ in candidates:
+                logger.info("Пробуем: Request=0x%03X", request_id)
+                try:
+                    self.j2534.write_message(request_id, probe)
+                except Exception as e:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Не отправлено на 0x%03X: %s", request_id, e)
+
+            # Сбор ответов: первый валидный положительный ответ (0x62)
+            # определяет рабочую пару
+            # Первое вхождение выигрывает: физический request_id
+            # предпочтительнее функционального для того же response_id
+            response_map = {}
+            for req, resp in candidates:
+                response_map.setdefault(resp, (req, resp))
+            deadline = time.monotonic() + window
+
+            while time.monotonic() < deadline:
+                for can_id, data in self.j2534.get_queued_messages():
+                    pair = response_map.get(can_id)
+                    if pair is None or len(data) < 3:
+                        continue
+                    # SF: SID в data[1]; FF (VIN длиннее 7 байт): SID в data[2]
+                    frame_type = (data[0] >> 4) & 0x0F
+                    if ((frame_type == 0x0 and data[1] == 0x62)
+                            or (frame_type == 0x1 and data[2] == 0x62)):
+                        logger.info("✅ Успех! Найдены рабочие CAN ID: Request=0x%03X, Response=0x%03X",
+                                    pair[0], pair[1])
+                        return pair
+                time.sleep(0.01)
+
+        except Exception as e:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Автопоиск не удался: %s", e)
+
         return None
     
     def disconnect(self):
@@ -275,11 +490,16 @@ class HarleyDiagnostics:
         try:
             # Остановка TesterPresent
             if self.uds:
+                # Момент последней активности сессии — для кэша при reconnect
+                self._last_session_activity = max(
+                    self._last_session_activity,
+                    getattr(self.uds, 'last_tester_present', 0.0)
+                )
                 try:
                     logger.info("   Остановка TesterPresent...")
                     self.uds.stop_tester_present()
                 except Exception as e:
-                    logger.warning(f"⚠️ Ошибка остановки TesterPresent: {e}")
+                    logger.warning("⚠️ Ошибка остановки TesterPresent: %s", e)
                     disconnect_errors.append(("TesterPresent", str(e)))
             
             # Отключение канала J2534
@@ -288,7 +508,7 @@ class HarleyDiagnostics:
                     logger.info("   Отключение канала J2534...")
                     self.j2534.disconnect_channel()
                 except Exception as e:
-                    logger.warning(f"⚠️ Ошибка отключения канала: {e}")
+                    logger.warning("⚠️ Ошибка отключения канала: %s", e)
                     disconnect_errors.append(("J2534 Channel", str(e)))
                 
                 # Закрытие устройства J2534
@@ -296,20 +516,20 @@ class HarleyDiagnostics:
                     logger.info("   Закрытие устройства J2534...")
                     self.j2534.close_device()
                 except Exception as e:
-                    logger.warning(f"⚠️ Ошибка закрытия устройства: {e}")
+                    logger.warning("⚠️ Ошибка закрытия устройства: %s", e)
                     disconnect_errors.append(("J2534 Device", str(e)))
             
             self.connected = False
             
             if disconnect_errors:
-                logger.warning(f"⚠️ Отключение завершено с {len(disconnect_errors)} предупреждениями")
+                logger.warning("⚠️ Отключение завершено с %d предупреждениями", len(disconnect_errors))
                 for component, error in disconnect_errors:
-                    logger.debug(f"   {component}: {error}")
+                    logger.debug("   %s: %s", component, error)
             else:
                 logger.info("✅ Отключение успешно")
             
         except Exception as e:
-            logger.error(f"❌ Критическая ошибка при отключении: {e}")
+            logger.error("❌ Критическая ошибка при отключении: %s", e)
             global_error_handler.handle_error(
                 e,
                 severity=ErrorSeverity.WARNING,  # Не критично, т.к. мы уже завершаем
@@ -335,13 +555,19 @@ class HarleyDiagnostics:
             )
             return None
         
+        # VIN не меняется в пределах сессии: повторные вызовы обслуживаются
+        # из кэша без round-trip к ЭБУ
+        if self._vin_cache is not None:
+            logger.info("✅ VIN (из кэша): %s", self._vin_cache)
+            return self._vin_cache
+
         logger.info("-" * 60)
         logger.info("🔍 Чтение VIN...")
         
         try:
             # Retry механизм для чтения VIN
             def _read_vin_attempt():
-                data = self.uds.read_data_by_identifier(config.DIDS['VIN'])
+                data = self.uds.read_data_by_identifier(self._vin_did)
                 
                 if not data:
                     raise Exception("Не получены данные VIN от ЭБУ")
@@ -350,6 +576,13 @@ class HarleyDiagnostics:
                 if len(data) != 17:
                     raise ValueError(f"Некорректная длина VIN: {len(data)} байт (ожидается 17)")
                 
+                # Проверка на недопустимые символы (I, O, Q не используются
+                # в VIN) — на сырых байтах, до decode() и без аллокаций
+                if not _VIN_INVALID_BYTES.isdisjoint(data):
+                    invalid_chars = {chr(b).upper() for b in _VIN_INVALID_BYTES.intersection(data)}
+                    logger.warning("⚠️ VIN содержит недопустимые символы: %s",
+                                   ', '.join(sorted(invalid_chars)))
+                
                 # Декодирование
                 try:
                     vin = data.decode('ascii')
@@ -359,14 +592,9 @@ class HarleyDiagnostics:
                 
                 # Валидация формата VIN
                 if not vin.replace(' ', '').isalnum():
-                    logger.warning(f"⚠️ VIN содержит неожиданные символы: {vin}")
+                    logger.warning("⚠️ VIN содержит неожиданные символы: %s", vin)
                 
-                # Проверка на недопустимые символы (I, O, Q не используются в VIN)
-                invalid_chars = [c for c in vin.upper() if c in 'IOQ']
-                if invalid_chars:
-                    logger.warning(f"⚠️ VIN содержит недопустимые символы: {', '.join(set(invalid_chars))}")
-                
-                logger.info(f"✅ VIN успешно прочитан: {vin}")
+                logger.info("✅ VIN успешно прочитан: %s", vin)
                 return vin
             
             # Попытка чтения с retry
@@ -377,13 +605,15 @@ class HarleyDiagnostics:
                 error_category=ErrorCategory.DATA
             )
             
+            if vin:
+                self._vin_cache = vin
             return vin
                 
         except DiagnosticError as e:
-            logger.error(f"❌ Диагностическая ошибка чтения VIN: {e.message}")
+            logger.error("❌ Диагностическая ошибка чтения VIN: %s", e.message)
             return None
         except Exception as e:
-            logger.error(f"❌ Ошибка чтения VIN: {e}")
+            logger.error("❌ Ошибка чтения VIN: %s", e)
             global_error_handler.handle_error(
                 e,
                 severity=ErrorSeverity.RECOVERABLE,
@@ -392,10 +622,20 @@ class HarleyDiagnostics:
             )
             return None
     
-    def scan_for_odometer(self, start_did: int = 0xF191, end_did: int = 0xF1A0) -> Optional[Dict[str, Any]]:
+    def iter_scan_for_odometer(self, start_did: int = 0xF191, end_did: int = 0xF1A0,
+                               stop_on_match: bool = False):
         """
-        Сканирование DIDs для поиска одометра (пробега) с улучшенной обработкой
-        Возвращает словарь с найденными DID и их данными
+        Потоковое сканирование DIDs для поиска одометра (пробега)
+
+        Генератор выдаёт пары (did, result) по мере получения ответов —
+        потребитель может обрабатывать значения на лету или прервать
+        сканирование досрочно, не дожидаясь полного прохода диапазона.
+        Для получения словаря целиком используйте scan_for_odometer().
+
+        При stop_on_match=True сканирование завершается досрочно, как только
+        встречается DID с правдоподобным значением пробега (3-4-байтовое
+        число, которое после масштабирования попадает в диапазон
+        100..300000 км) — в среднем это экономит около половины запросов.
         """
         if not self.connected:
             error = Exception("Не подключено к мотоциклу")
@@ -405,7 +645,7 @@ class HarleyDiagnostics:
                 category=ErrorCategory.CONNECTION,
                 recovery_hint="Сначала выполните подключение"
             )
-            return None
+            return
         
         # Валидация диапазона
         if start_did < 0 or start_did > 0xFFFF or end_did < 0 or end_did > 0xFFFF:
@@ -416,129 +656,222 @@ class HarleyDiagnostics:
                 category=ErrorCategory.DATA,
                 recovery_hint="DID должны быть в диапазоне 0x0000-0xFFFF"
             )
-            return None
+            return
         
         if start_did > end_did:
-            logger.warning(f"⚠️ Начальный DID больше конечного, меняем местами")
+            logger.warning("⚠️ Начальный DID больше конечного, меняем местами")
             start_did, end_did = end_did, start_did
         
         total_dids = end_did - start_did + 1
         if total_dids > 1000:
-            logger.warning(f"⚠️ Большой диапазон сканирования: {total_dids} DIDs. Это может занять много времени.")
+            logger.warning("⚠️ Большой диапазон сканирования: %d DIDs. Это может занять много времени.", total_dids)
         
         logger.info("-" * 60)
-        logger.info(f"🔍 Сканирование DIDs 0x{start_did:04X} - 0x{end_did:04X} для поиска одометра...")
-        logger.info(f"   Всего DIDs для проверки: {total_dids}")
+        logger.info("🔍 Сканирование DIDs 0x%04X - 0x%04X для поиска одометра...", start_did, end_did)
+        logger.info("   Всего DIDs для проверки: %d", total_dids)
         logger.info("-" * 60)
         
-        results = {}
         successful_reads = 0
         failed_reads = 0
-        progress_interval = max(1, total_dids // 20)  # Вывод прогресса каждые 5%
-        
+        # Пакетное чтение: несколько DID в одном UDS 0x22 запросе вместо
+        # round-trip + паузы на каждый DID (ISO-TP сам задаёт темп обмена)
+        batch_size = _SCAN_BATCH_SIZE
+        # Приоритетный порядок: сначала известные «вероятные» DID одометра,
+        # затем остальной диапазон — вместе со stop_on_match типичный скан
+        # завершается за 1-3 запроса вместо полного прохода
+        likely = [d for d in config.LIKELY_ODOMETER_DIDS
+                  if start_did <= d <= end_did]
+        likely_set = frozenset(likely)
+        did_list = likely + [d for d in range(start_did, end_did + 1)
+                             if d not in likely_set]
+        processed = 0
+        # Адаптивный темп: пауза появляется только если ЭБУ сигналит
+        # занятость (NRC 0x21 busyRepeatRequest / 0x78 responsePending)
+        # и экспоненциально растёт до потолка 100 мс
+        busy_delay = 0.0
+
         try:
-            for index, did in enumerate(range(start_did, end_did + 1), 1):
+            for batch_start in range(0, total_dids, batch_size):
+                batch = list(did_list[batch_start:batch_start + batch_size])
+
+                if getattr(self.uds, 'last_nrc', None) in (0x21, 0x78):
+                    if busy_delay:
+                        time.sleep(busy_delay)
+                    busy_delay = min(max(busy_delay * 2, 0.0125), 0.1)
+                else:
+                    busy_delay = 0.0
+
                 try:
-                    # Вывод прогресса
-                    if index % progress_interval == 0 or index == total_dids:
-                        progress = (index / total_dids) * 100
-                        logger.info(f"📊 Прогресс: {progress:.0f}% ({index}/{total_dids}) - найдено: {successful_reads}")
-                    
-                    data = self.uds.read_data_by_identifier(did)
-                    
-                    if data:
-                        successful_reads += 1
-                        
-                        # Анализ данных
-                        results[did] = {
-                            'raw_data': data.hex().upper(),
-                            'length': len(data),
-                            'possible_values': self._analyze_odometer_data(data)
-                        }
-                        
-                        logger.info(f"✅ DID 0x{did:04X}: {data.hex().upper()} ({len(data)} байт)")
-                        
-                        # Анализ возможных значений
-                        for interpretation in results[did]['possible_values']:
-                            logger.info(f"   ➡️ {interpretation}")
-                    else:
-                        failed_reads += 1
-                    
-                    # Небольшая задержка между запросами для стабильности
-                    time.sleep(0.1)
-                    
+                    # quiet=True: молчащие DID не гоняют global_error_handler
+                    batch_results = self.uds.read_data_by_identifiers(batch, quiet=True)
                 except KeyboardInterrupt:
                     logger.warning("⚠️ Сканирование прервано пользователем")
                     break
                 except Exception as e:
-                    failed_reads += 1
-                    logger.debug(f"DID 0x{did:04X}: недоступен ({e})")
+                    failed_reads += len(batch)
+                    processed += len(batch)
+                    # isEnabledFor-гейт: в горячем цикле сканирования даже
+                    # подготовка аргументов debug-записи не бесплатна
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Пакет DID 0x%04X-0x%04X: недоступен (%s)",
+                                     batch[0], batch[-1], e)
+                    continue
+
+                processed += len(batch)
+                successful_reads += len(batch_results)
+                failed_reads += len(batch) - len(batch_results)
+
+                # Вывод прогресса (по одному сообщению на пакет)
+                progress = (processed / total_dids) * 100
+                logger.info("📊 Прогресс: %.0f%% (%d/%d) - найдено: %d",
+                            progress, processed, total_dids, successful_reads)
+
+                match_found = False
+                for did, data in batch_results.items():
+                    # Анализ данных (hex-представление вычисляется один раз
+                    # на ответ и переиспользуется в словаре и логе)
+                    interpretations, plausibility = self._analyze_odometer_data(data)
+                    hex_upper = data.hex().upper()
+
+                    # Лениво форматируемые %-аргументы: строка собирается
+                    # только если уровень INFO действительно включён
+                    logger.info("✅ DID %s: %s (%d байт)", _did_hex(did), hex_upper, len(data))
+
+                    # Анализ возможных значений (лениво: __str__ у
+                    # интерпретаций вызывается только при включённом INFO)
+                    if logger.isEnabledFor(logging.INFO):
+                        for interpretation in interpretations:
+                            logger.info("   ➡️ %s", interpretation)
+
+                    yield did, {
+                        'raw_data': hex_upper,
+                        'length': len(data),
+                        'possible_values': interpretations,
+                        'plausibility': plausibility
+                    }
+
+                    if stop_on_match and plausibility > 0:
+                        logger.info("💡 Правдоподобный пробег в DID %s — досрочное завершение сканирования", _did_hex(did))
+                        match_found = True
+
+                if match_found:
+                    break
             
             # Итоговая статистика
             logger.info("-" * 60)
-            logger.info(f"📊 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:")
-            logger.info(f"   Успешно прочитано: {successful_reads} DIDs")
-            logger.info(f"   Не удалось прочитать: {failed_reads} DIDs")
-            logger.info(f"   Всего проверено: {successful_reads + failed_reads} из {total_dids}")
+            logger.info("📊 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:")
+            logger.info("   Успешно прочитано: %d DIDs", successful_reads)
+            logger.info("   Не удалось прочитать: %d DIDs", failed_reads)
+            logger.info("   Всего проверено: %d из %d", successful_reads + failed_reads, total_dids)
             logger.info("-" * 60)
-            
-            if results:
-                logger.info(f"✅ Найдено {len(results)} доступных DIDs")
-                logger.info("💡 Сравните полученные значения с показаниями на панели мотоцикла")
-                return results
-            else:
-                logger.warning("⚠️ Не найдено доступных DIDs в указанном диапазоне")
-                global_error_handler.handle_error(
-                    Exception("No DIDs found in scan range"),
-                    severity=ErrorSeverity.WARNING,
-                    category=ErrorCategory.DATA,
-                    recovery_hint="Попробуйте другой диапазон или используйте --auto-detect"
-                )
-                return None
                 
         except Exception as e:
-            logger.error(f"❌ Критическая ошибка во время сканирования: {e}")
+            # Уже выданные пары остаются у потребителя — теряется только хвост
+            logger.error("❌ Критическая ошибка во время сканирования: %s", e)
             global_error_handler.handle_error(
                 e,
                 severity=ErrorSeverity.CRITICAL,
                 category=ErrorCategory.SYSTEM,
                 context={"scanned": successful_reads, "failed": failed_reads}
             )
-            return results if results else None
+
+    def scan_for_odometer(self, start_did: int = 0xF191, end_did: int = 0xF1A0,
+                          stop_on_match: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Сканирование DIDs для поиска одометра (пробега)
+
+        Тонкая обёртка над iter_scan_for_odometer(): материализует поток
+        результатов в словарь {did: result}. Возвращает None, если не
+        найдено ни одного доступного DID.
+        """
+        results = dict(self.iter_scan_for_odometer(start_did, end_did, stop_on_match))
+
+        if results:
+            logger.info("✅ Найдено %d доступных DIDs", len(results))
+            logger.info("💡 Сравните полученные значения с показаниями на панели мотоцикла")
+            return results
+
+        logger.warning("⚠️ Не найдено доступных DIDs в указанном диапазоне")
+        global_error_handler.handle_error(
+            Exception("No DIDs found in scan range"),
+            severity=ErrorSeverity.WARNING,
+            category=ErrorCategory.DATA,
+            recovery_hint="Попробуйте другой диапазон или используйте --auto-detect"
+        )
+        return None
     
-    def _analyze_odometer_data(self, data: bytes) -> List[str]:
-        """Анализ данных для определения возможных значений пробега"""
+    def _analyze_odometer_data(self, data: bytes) -> tuple:
+        """Анализ данных для определения возможных значений пробега
+
+        Возвращает (interpretations, plausibility_score), где score —
+        число интерпретаций, попадающих после масштабирования в диапазон
+        правдоподобного пробега _PLAUSIBLE_KM_RANGE.
+        """
         interpretations = []
+        candidates = []
+        n = len(data)
         
-        # Проб разных интерпретаций
-        
-        # 1. 2-байтовое значение (Big Endian)
-        if len(data) >= 2:
-            value_2b = int.from_bytes(data[:2], byteorder='big')
-            interpretations.append(f"2-byte (BE): {value_2b} (может быть {value_2b/10:.1f} km с коэф. 0.1)")
+        # Одна распаковка 4-байтового BE-слова (с нулевым дополнением);
+        # 2- и 3-байтовые значения получаются из него сдвигами
+        if n >= 2:
+            value_4b = _U32.unpack_from(data.ljust(4, b'\x00'))[0]
+
+            # 1. 2-байтовое значение (Big Endian)
+            value_2b = value_4b >> 16
+            interpretations.append(_Interpretation(
+                "2-byte (BE): %d (может быть %.1f km с коэф. 0.1)", value_2b, value_2b / 10))
+            candidates.append(value_2b / 10)
         
         # 2. 3-байтовое значение
-        if len(data) >= 3:
-            value_3b = int.from_bytes(data[:3], byteorder='big')
-            interpretations.append(f"3-byte (BE): {value_3b} km (или {value_3b/10:.1f} km с коэф. 0.1)")
-            interpretations.append(f"3-byte (BE): {value_3b * 0.621371:.1f} miles (если в милях)")
+        if n >= 3:
+            value_3b = value_4b >> 8
+            value_3b_tenth = value_3b / 10
+            interpretations.append(_Interpretation(
+                "3-byte (BE): %d km (или %.1f km с коэф. 0.1)", value_3b, value_3b_tenth))
+            interpretations.append(_Interpretation(
+                "3-byte (BE): %.1f miles (если в милях)", value_3b * 0.621371))
+            candidates.extend((value_3b, value_3b_tenth))
         
         # 3. 4-байтовое значение
-        if len(data) >= 4:
-            value_4b = int.from_bytes(data[:4], byteorder='big')
-            interpretations.append(f"4-byte (BE): {value_4b} (может быть {value_4b/10:.1f} km с коэф. 0.1)")
-            interpretations.append(f"4-byte (BE): {value_4b/100:.2f} km с коэф. 0.01")
-        
-        # 4. Попытка декодировать как ASCII (если текстовые данные)
-        try:
+        if n >= 4:
+            interpretations.append(_Interpretation(
+                "4-byte (BE): %d (может быть %.1f km с коэф. 0.1)", value_4b, value_4b / 10))
+            interpretations.append(_Interpretation(
+                "4-byte (BE): %.2f km с коэф. 0.01", value_4b / 100))
+            candidates.extend((value_4b / 10, value_4b / 100))
+        
+        # 4. Попытка декодировать как ASCII (если текстовые данные):
+        # isascii() — C-проверка без затрат на выброс/перехват исключения
+        # для бинарных данных
+        if data.isascii():
             ascii_str = data.decode('ascii')
             if ascii_str.isprintable():
-                interpretations.append(f"ASCII: '{ascii_str}'")
-        except:
-            pass
+                interpretations.append(_Interpretation("ASCII: '%s'", ascii_str))
         
-        return interpretations
+        low, high = _PLAUSIBLE_KM_RANGE
+        plausibility = sum(1 for km in candidates if low <= km <= high)
+        return interpretations, plausibility
     
+    @staticmethod
+    def _analyze_odometer_batch(data_list: List[bytes]) -> List[int]:
+        """Пакетный подсчёт правдоподобия пробега для списка ответов DID
+
+        Каждое значение умножается на все кандидатные коэффициенты
+        _ODOMETER_SCALES; оценка — число интерпретаций, попавших в
+        диапазон _PLAUSIBLE_KM_RANGE. При наличии numpy весь пакет
+        обрабатывается одной матричной операцией (N × len(scales));
+        без него — эквивалентным чистым Python.
+        """
+        low, high = _PLAUSIBLE_KM_RANGE
+        raw = [int.from_bytes(data[:4], 'big') for data in data_list]
+
+        if numpy is not None and raw:
+            mat = numpy.asarray(raw, dtype=numpy.float64)[:, None] * numpy.asarray(_ODOMETER_SCALES)
+            return ((mat >= low) & (mat <= high)).sum(axis=1).tolist()
+
+        return [sum(1 for scale in _ODOMETER_SCALES if low <= value * scale <= high)
+                for value in raw]
+
     def read_odometer(self, did: int) -> Optional[Dict[str, Any]]:
         """Чтение конкретного DID одометра"""
         if not self.connected:
@@ -546,24 +879,27 @@ class HarleyDiagnostics:
             return None
         
         logger.info("-" * 60)
-        logger.info(f"🔍 Чтение одометра (DID 0x{did:04X})...")
+        logger.info("🔍 Чтение одометра (DID %s)...", _did_hex(did))
         
         try:
             data = self.uds.read_data_by_identifier(did)
             
             if data:
+                interpretations, plausibility = self._analyze_odometer_data(data)
+                hex_upper = data.hex().upper()
                 result = {
                     'did': did,
-                    'raw_data': data.hex().upper(),
+                    'raw_data': hex_upper,
                     'length': len(data),
-                    'interpretations': self._analyze_odometer_data(data)
+                    'interpretations': interpretations,
+                    'plausibility': plausibility
                 }
                 
-                logger.info(f"✅ Одометр DID 0x{did:04X}:")
-                logger.info(f"   Raw: {result['raw_data']}")
+                logger.info("✅ Одометр DID %s:", _did_hex(did))
+                logger.info("   Raw: %s", result['raw_data'])
                 
                 for interpretation in result['interpretations']:
-                    logger.info(f"   ➡️ {interpretation}")
+                    logger.info("   ➡️ %s", interpretation)
                 
                 return result
             else:
@@ -571,7 +907,7 @@ class HarleyDiagnostics:
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Ошибка чтения одометра: {e}")
+            logger.error("❌ Ошибка чтения одометра: %s", e)
             return None
     
     def read_ecu_info(self) -> Dict[str, Any]:
@@ -585,37 +921,27 @@ class HarleyDiagnostics:
         
         info = {}
         
-        # Список стандартных DIDs
-        standard_dids = {
-            0xF18C: 'ECU Serial Number',
-            0xF190: 'VIN',
-            0xF191: 'Hardware Number',
-            0xF192: 'Software Number',
-            0xF194: 'Supplier ID',
-            0xF195: 'Date of Manufacture',
-            0xF197: 'System Name',
-            0xF19E: 'Active Diagnostic Session'
-        }
-        
-        for did, name in standard_dids.items():
-            try:
-                data = self.uds.read_data_by_identifier(did)
-                if data:
-                    # Попытка декодировать как ASCII
-                    try:
-                        decoded = data.decode('ascii', errors='ignore')
-                        if decoded.isprintable():
-                            info[name] = decoded
-                        else:
-                            info[name] = data.hex().upper()
-                    except:
-                        info[name] = data.hex().upper()
-                    
-                    logger.info(f"✅ {name}: {info[name]}")
-                    
-                time.sleep(0.1)
-            except Exception as e:
-                logger.debug(f"{name}: недоступен")
+        # Все стандартные DID запрашиваются одним multi-DID 0x22 запросом
+        # (один round-trip вместо восьми с паузами между ними)
+        try:
+            records = self.uds.read_data_by_identifiers(self._ECU_INFO_DIDS)
+        except Exception as e:
+            logger.error("❌ Ошибка чтения информации о ЭБУ: %s", e)
+            return info
+
+        for did, name in self._ECU_INFO_DIDS.items():
+            data = records.get(did)
+            if data:
+                # Попытка декодировать как ASCII
+                try:
+                    decoded = data.decode('ascii', errors='ignore')
+                    info[name] = decoded if decoded.isprintable() else data.hex().upper()
+                except:
+                    info[name] = data.hex().upper()
+
+                logger.info("✅ %s: %s", name, info[name])
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s: недоступен", name)
         
         return info
     
@@ -646,9 +972,9 @@ class HarleyDiagnostics:
                 f.write(f"ODOMETER_SCALE_FACTOR = {scale_factor}\n")
                 f.write(f"ODOMETER_UNIT = '{unit}'\n")
             
-            logger.info(f"✅ Параметры сохранены в {params_file}")
+            logger.info("✅ Параметры сохранены в %s", params_file)
             print(f"\n✅ Найденные параметры сохранены в {params_file}")
             print("📝 Скопируйте их в config.py для дальнейшего использования")
             
         except Exception as e:
-            logger.error(f"Ошибка сохранения параметров: {e}")
+            logger.error("Ошибка сохранения параметров: %s", e)
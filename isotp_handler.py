@@ -1,5 +1,11 @@
 """ISO-TP (Транспортный протокол ISO 15765-2) для многокадровых сообщений"""
+import atexit
+import collections
+import functools
 import logging
+import queue
+import struct
+import sys
 import time
 from typing import Optional, List, Tuple
 
@@ -19,6 +25,69 @@ FC_CONTINUE = 0x0  # Продолжать передачу
 FC_WAIT = 0x1      # Подождать
 FC_OVERFLOW = 0x2  # Переполнение буфера
 
+# Предвычисленные базы заголовочных байтов кадров (PCI-типы в старшем
+# ниббле): в горячих циклах остаётся только OR с длиной/номером
+_SF_HEADER_BASE = SINGLE_FRAME << 4
+_CF_HEADER_BASE = CONSECUTIVE_FRAME << 4
+_FC_CONTINUE_HEADER = FLOW_CONTROL << 4 | FC_CONTINUE
+
+# Заголовок First Frame: тип кадра (4 бита) + длина (12 бит) одним big-endian
+# словом — pack/unpack целиком вместо ручной сборки двух байтов
+_FF_HDR = struct.Struct('>H')
+
+# Разобранный кадр Flow Control: namedtuple вместо словаря — без
+# аллокации dict и хеширования ключей на каждую многокадровую передачу
+FlowControl = collections.namedtuple('FlowControl', 'status bs stmin')
+
+@functools.lru_cache(maxsize=64)
+def _cf_headers(n_frames: int) -> bytes:
+    """Предвычисленная цепочка заголовков Consecutive Frame для пакета
+
+    Заголовки CF зависят только от числа кадров (номера идут по кругу
+    1..15,0,...), поэтому для повторяющихся размеров полезной нагрузки
+    таблица строится один раз и переиспользуется.
+    """
+    return bytes(_CF_HEADER_BASE | ((i + 1) & 0x0F) for i in range(n_frames))
+
+
+_timer_resolution_raised = False
+
+
+def _raise_timer_resolution():
+    """Повышение разрешения системного таймера Windows до 1 мс
+
+    Стандартный тик 15.625 мс раздувает time.sleep(STmin) в ~10 раз и
+    межкадровые паузы Consecutive Frame растягивают передачу. Вызывается
+    один раз на процесс; исходное разрешение возвращается через atexit.
+    """
+    global _timer_resolution_raised
+    if _timer_resolution_raised or sys.platform != 'win32':
+        return
+    _timer_resolution_raised = True
+    try:
+        import ctypes
+        ctypes.windll.winmm.timeBeginPeriod(1)
+        atexit.register(ctypes.windll.winmm.timeEndPeriod, 1)
+        logger.debug("Разрешение таймера Windows повышено до 1 мс")
+    except Exception as e:
+        logger.debug("Не удалось повысить разрешение таймера: %s", e)
+
+
+class _Hex:
+    """Ленивое hex-представление кадра для отладочных логов
+
+    hex().upper() выполняется только если запись действительно
+    форматируется обработчиком — при выключенном DEBUG кадровые пути
+    не платят за строковую аллокацию на каждый кадр.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __str__(self):
+        return self._data.hex().upper()
+
 
 class ISOTPException(Exception):
     """Исключение для ошибок ISO-TP"""
@@ -35,8 +104,26 @@ class ISOTPHandler:
         self.bs = config.ISO_TP_BS
         self.stmin = config.ISO_TP_STMIN
         self.timeout = config.ISO_TP_TIMEOUT
+        # Один переиспользуемый 8-байтовый буфер для исходящих кадров:
+        # заголовок и срез полезной нагрузки пишутся на место вместо
+        # четырёх bytes-аллокаций на каждый кадр
+        self._tx_buf = bytearray(8)
+        _raise_timer_resolution()
         
-        logger.info(f"ISO-TP инициализирован: Request=0x{request_id:03X}, Response=0x{response_id:03X}")
+        logger.info("ISO-TP инициализирован: Request=0x%03X, Response=0x%03X", request_id, response_id)
+    
+    def reset(self, request_id: int, response_id: int):
+        """Перенацеливание обработчика на другую пару CAN ID
+
+        Позволяет переиспользовать один экземпляр между попытками
+        подключения вместо создания нового объекта: обновляются адреса
+        и сбрасываются накопленные кадры в очереди J2534.
+        """
+        self.request_id = request_id
+        self.response_id = response_id
+        # Кадры от прежней пары больше не актуальны
+        self.j2534.get_queued_messages()
+        logger.debug("ISO-TP перенастроен: Request=0x%03X, Response=0x%03X", request_id, response_id)
     
     def send(self, data: bytes) -> bool:
         """Отправка данных с использованием ISO-TP и валидацией"""
@@ -87,12 +174,16 @@ class ISOTPHandler:
     
     def _send_single_frame(self, data: bytes) -> bool:
         """Отправка Single Frame"""
-        frame_data = bytes([SINGLE_FRAME << 4 | len(data)]) + data
-        # Дополнение до 8 байт (опционально)
-        if len(frame_data) < 8:
-            frame_data += bytes([0x00] * (8 - len(frame_data)))
+        data_len = len(data)
+        buf = self._tx_buf
+        buf[0] = _SF_HEADER_BASE | data_len
+        buf[1:1 + data_len] = data
+        # Дополнение до 8 байт
+        for i in range(1 + data_len, 8):
+            buf[i] = 0x00
+        frame_data = bytes(buf)
         
-        logger.debug(f"ISO-TP Single Frame: {frame_data.hex().upper()}")
+        logger.debug("ISO-TP Single Frame: %s", _Hex(frame_data))
         return self.j2534.write_message(self.request_id, frame_data)
     
     def _send_multi_frame(self, data: bytes) -> bool:
@@ -100,131 +191,182 @@ class ISOTPHandler:
         data_len = len(data)
         
         # First Frame (FF)
-        ff_len_high = (data_len >> 8) & 0x0F
-        ff_len_low = data_len & 0xFF
-        ff_data = bytes([FIRST_FRAME << 4 | ff_len_high, ff_len_low]) + data[:6]
+        buf = self._tx_buf
+        _FF_HDR.pack_into(buf, 0, (FIRST_FRAME << 12) | (data_len & 0x0FFF))
+        buf[2:8] = data[:6]
+        ff_data = bytes(buf)
         
-        logger.debug(f"ISO-TP First Frame: {ff_data.hex().upper()}")
+        logger.debug("ISO-TP First Frame: %s", _Hex(ff_data))
         if not self.j2534.write_message(self.request_id, ff_data):
             return False
         
         # Ожидание Flow Control
         fc = self._wait_for_flow_control()
-        if fc is None or fc['status'] != FC_CONTINUE:
+        if fc is None or fc.status != FC_CONTINUE:
             logger.error("Не получен Flow Control или получен отказ")
             return False
         
         # Отправка Consecutive Frames (CF)
         remaining_data = data[6:]
+        total = len(remaining_data)
+
+        if self.stmin == 0:
+            # Без межкадровой паузы весь хвост уходит одним вызовом
+            # PassThruWriteMsgs — DLL-переход на блок, а не на кадр
+            n_frames = (total + 6) // 7
+            headers = _cf_headers(n_frames)
+            frames = []
+            for idx in range(n_frames):
+                chunk = remaining_data[idx * 7:idx * 7 + 7]
+                buf[0] = headers[idx]
+                buf[1:1 + len(chunk)] = chunk
+                for i in range(1 + len(chunk), 8):
+                    buf[i] = 0x00
+                frames.append(bytes(buf))
+            logger.debug("ISO-TP: пакетная отправка %d Consecutive Frames", len(frames))
+            return self.j2534.write_messages(self.request_id, frames)
+
         seq_num = 1
         offset = 0
-        
-        while offset < len(remaining_data):
-            cf_data = bytes([CONSECUTIVE_FRAME << 4 | (seq_num & 0x0F)]) + remaining_data[offset:offset+7]
-            # Дополнение до 8 байт
-            if len(cf_data) < 8:
-                cf_data += bytes([0x00] * (8 - len(cf_data)))
+
+        while offset < total:
+            chunk = remaining_data[offset:offset + 7]
+            buf[0] = _CF_HEADER_BASE | (seq_num & 0x0F)
+            buf[1:1 + len(chunk)] = chunk
+            # Дополнение до 8 байт (только у последнего неполного кадра)
+            for i in range(1 + len(chunk), 8):
+                buf[i] = 0x00
+            cf_data = bytes(buf)
             
-            logger.debug(f"ISO-TP Consecutive Frame #{seq_num}: {cf_data.hex().upper()}")
+            logger.debug("ISO-TP Consecutive Frame #%d: %s", seq_num, _Hex(cf_data))
             if not self.j2534.write_message(self.request_id, cf_data):
                 return False
             
-            seq_num = (seq_num + 1) % 16
+            seq_num = (seq_num + 1) & 0x0F
             offset += 7
             
-            # Задержка между кадрами (STmin)
+            # Задержка между кадрами (STmin). Для суб-2-мс пауз sleep
+            # слишком груб даже при 1-мс тике — точный spin-wait на
+            # perf_counter_ns держит межкадровый интервал вплотную к STmin
             if self.stmin > 0:
-                time.sleep(self.stmin / 1000.0)
+                if self.stmin < 2:
+                    spin_deadline = time.perf_counter_ns() + self.stmin * 1_000_000
+                    while time.perf_counter_ns() < spin_deadline:
+                        pass
+                else:
+                    time.sleep(self.stmin / 1000.0)
         
         return True
     
-    def _wait_for_flow_control(self) -> Optional[dict]:
-        """Ожидание кадра Flow Control от ЭБУ"""
-        start_time = time.time()
+    def _wait_for_flow_control(self) -> Optional[FlowControl]:
+        """Ожидание кадра Flow Control от ЭБУ
+
+        Блокирующее ожидание на очереди кадров: поток чтения J2534 будит
+        нас сразу при поступлении кадра, без 10-мс sleep-опроса.
+        """
+        rx = self.j2534.rx_queue(self.response_id)
+        # Монотонный дедлайн: не подвержен скачкам системных часов (NTP)
+        deadline_ns = time.monotonic_ns() + self.timeout * 1_000_000
         
-        while (time.time() - start_time) < (self.timeout / 1000.0):
-            messages = self.j2534.get_queued_messages(self.response_id)
+        while True:
+            remaining_ns = deadline_ns - time.monotonic_ns()
+            if remaining_ns <= 0:
+                break
+            try:
+                data = rx.get(timeout=remaining_ns / 1e9)
+            except queue.Empty:
+                break
+
+            if len(data) < 1:
+                continue
             
-            for can_id, data in messages:
-                if len(data) < 1:
-                    continue
+            frame_type = (data[0] >> 4) & 0x0F
+            if frame_type == FLOW_CONTROL:
+                fc_status = data[0] & 0x0F
+                bs = data[1] if len(data) > 1 else 0
+                stmin = data[2] if len(data) > 2 else 0
                 
-                frame_type = (data[0] >> 4) & 0x0F
-                if frame_type == FLOW_CONTROL:
-                    fc_status = data[0] & 0x0F
-                    bs = data[1] if len(data) > 1 else 0
-                    stmin = data[2] if len(data) > 2 else 0
-                    
-                    logger.debug(f"Flow Control: Status={fc_status}, BS={bs}, STmin={stmin}")
-                    return {'status': fc_status, 'bs': bs, 'stmin': stmin}
-            
-            time.sleep(0.01)
+                logger.debug("Flow Control: Status=%d, BS=%d, STmin=%d", fc_status, bs, stmin)
+                return FlowControl(fc_status, bs, stmin)
         
         logger.error("Timeout ожидания Flow Control")
         return None
     
-    def receive(self, timeout: Optional[int] = None) -> Optional[bytes]:
-        """Прием ISO-TP сообщения (Single Frame или Multi-frame) с улучшенной обработкой"""
+    def receive(self, timeout: Optional[int] = None, quiet: bool = False) -> Optional[bytes]:
+        """Прием ISO-TP сообщения (Single Frame или Multi-frame) с улучшенной обработкой
+
+        quiet=True убирает диспетчеризацию ошибки по таймауту: сканирующие
+        циклы, где молчание ЭБУ — ожидаемый исход, не платят за создание
+        исключения, словаря контекста и вызов обработчиков на каждый DID.
+        """
         try:
             if timeout is None:
                 timeout = self.timeout
             
             # Валидация timeout
             if timeout <= 0:
-                logger.warning(f"⚠️ Недопустимый timeout: {timeout}, используем значение по умолчанию")
+                logger.warning("⚠️ Недопустимый timeout: %s, используем значение по умолчанию", timeout)
                 timeout = self.timeout
             
-            start_time = time.time()
+            rx = self.j2534.rx_queue(self.response_id)
+            deadline_ns = time.monotonic_ns() + timeout * 1_000_000
             received_frames = 0
             
-            while (time.time() - start_time) < (timeout / 1000.0):
-                messages = self.j2534.get_queued_messages(self.response_id)
+            while True:
+                remaining_ns = deadline_ns - time.monotonic_ns()
+                if remaining_ns <= 0:
+                    break
+                try:
+                    data = rx.get(timeout=remaining_ns / 1e9)
+                except queue.Empty:
+                    break
+
+                received_frames += 1
+                
+                # Валидация данных кадра
+                if len(data) < 1:
+                    logger.debug("Пропущен пустой кадр")
+                    continue
+                
+                frame_type = (data[0] >> 4) & 0x0F
                 
-                for can_id, data in messages:
-                    received_frames += 1
+                if frame_type == SINGLE_FRAME:
+                    # Single Frame
+                    length = data[0] & 0x0F
                     
-                    # Валидация данных кадра
-                    if len(data) < 1:
-                        logger.debug("Пропущен пустой кадр")
+                    # Валидация длины
+                    if length > 7:
+                        logger.warning("⚠️ Недопустимая длина Single Frame: %d", length)
                         continue
                     
-                    frame_type = (data[0] >> 4) & 0x0F
-                    
-                    if frame_type == SINGLE_FRAME:
-                        # Single Frame
-                        length = data[0] & 0x0F
-                        
-                        # Валидация длины
-                        if length > 7:
-                            logger.warning(f"⚠️ Недопустимая длина Single Frame: {length}")
-                            continue
-                        
-                        if len(data) < (1 + length):
-                            logger.warning(f"⚠️ Недостаточно данных в Single Frame")
-                            continue
-                        
-                        payload = data[1:1+length]
-                        logger.debug(f"✅ ISO-TP Single Frame принят: {payload.hex().upper()}")
-                        return payload
+                    if len(data) < (1 + length):
+                        logger.warning("⚠️ Недостаточно данных в Single Frame")
+                        continue
                     
-                    elif frame_type == FIRST_FRAME:
-                        # Multi-frame: First Frame
-                        try:
-                            return self._receive_multi_frame(data, timeout)
-                        except Exception as e:
-                            logger.error(f"❌ Ошибка приёма multi-frame: {e}")
-                            global_error_handler.handle_error(
-                                e,
-                                severity=ErrorSeverity.RECOVERABLE,
-                                category=ErrorCategory.PROTOCOL,
-                                recovery_hint="Проверьте качество соединения CAN шины"
-                            )
-                            return None
+                    payload = data[1:1+length]
+                    logger.debug("✅ ISO-TP Single Frame принят: %s", _Hex(payload))
+                    return payload
                 
-                time.sleep(0.01)
+                elif frame_type == FIRST_FRAME:
+                    # Multi-frame: First Frame
+                    try:
+                        return self._receive_multi_frame(data, timeout)
+                    except Exception as e:
+                        logger.error("❌ Ошибка приёма multi-frame: %s", e)
+                        global_error_handler.handle_error(
+                            e,
+                            severity=ErrorSeverity.RECOVERABLE,
+                            category=ErrorCategory.PROTOCOL,
+                            recovery_hint="Проверьте качество соединения CAN шины"
+                        )
+                        return None
             
             # Timeout
-            logger.warning(f"⏱️ Timeout ожидания ISO-TP сообщения ({timeout} мс, получено {received_frames} кадров)")
+            if quiet:
+                logger.debug("⏱️ Timeout ожидания ISO-TP сообщения (%d мс, получено %d кадров)", timeout, received_frames)
+                return None
+
+            logger.warning("⏱️ Timeout ожидания ISO-TP сообщения (%d мс, получено %d кадров)", timeout, received_frames)
             
             if received_frames == 0:
                 global_error_handler.handle_error(
@@ -248,60 +390,63 @@ class ISOTPHandler:
     def _receive_multi_frame(self, first_frame_data: bytes, timeout: int) -> Optional[bytes]:
         """Прием многокадрового сообщения"""
         # Разбор First Frame
-        ff_len_high = first_frame_data[0] & 0x0F
-        ff_len_low = first_frame_data[1]
-        total_length = (ff_len_high << 8) | ff_len_low
+        total_length = _FF_HDR.unpack_from(first_frame_data, 0)[0] & 0x0FFF
         
-        logger.debug(f"ISO-TP First Frame: общая длина={total_length} байт")
+        logger.debug("ISO-TP First Frame: общая длина=%d байт", total_length)
         
-        # Первые 6 байт данных
-        payload = bytearray(first_frame_data[2:8])
+        # Предвыделенный буфер итогового размера: кадры пишутся по месту
+        # через memoryview — без realloc у extend и финальной срез-копии
+        payload = bytearray(total_length)
+        mv = memoryview(payload)
+        pos = min(6, total_length)
+        mv[0:pos] = first_frame_data[2:2 + pos]
         
         # Отправка Flow Control
-        fc_data = bytes([FLOW_CONTROL << 4 | FC_CONTINUE, self.bs, self.stmin])
-        # Дополнение до 8 байт
-        fc_data += bytes([0x00] * (8 - len(fc_data)))
+        # Дополнение до 8 байт одним C-вызовом вместо списка + конкатенации
+        fc_data = bytes([_FC_CONTINUE_HEADER, self.bs, self.stmin]).ljust(8, b'\x00')
         
-        logger.debug(f"ISO-TP отправка Flow Control: {fc_data.hex().upper()}")
+        logger.debug("ISO-TP отправка Flow Control: %s", _Hex(fc_data))
         if not self.j2534.write_message(self.request_id, fc_data):
             logger.error("Ошибка отправки Flow Control")
             return None
         
-        # Прием Consecutive Frames
+        # Прием Consecutive Frames (блокирующее ожидание каждого кадра)
         expected_seq = 1
-        start_time = time.time()
+        rx = self.j2534.rx_queue(self.response_id)
+        deadline_ns = time.monotonic_ns() + timeout * 1_000_000
         
-        while len(payload) < total_length:
-            if (time.time() - start_time) > (timeout / 1000.0):
+        while pos < total_length:
+            wait_ns = deadline_ns - time.monotonic_ns()
+            if wait_ns <= 0:
+                logger.error("Timeout при приеме Consecutive Frames")
+                return None
+            try:
+                data = rx.get(timeout=wait_ns / 1e9)
+            except queue.Empty:
                 logger.error("Timeout при приеме Consecutive Frames")
                 return None
+
+            if len(data) < 1:
+                continue
             
-            messages = self.j2534.get_queued_messages(self.response_id)
+            frame_type = (data[0] >> 4) & 0x0F
             
-            for can_id, data in messages:
-                if len(data) < 1:
-                    continue
+            if frame_type == CONSECUTIVE_FRAME:
+                seq_num = data[0] & 0x0F
                 
-                frame_type = (data[0] >> 4) & 0x0F
+                if seq_num != expected_seq:
+                    logger.warning("Неправильная последовательность CF: ожидалось %d, получено %d", expected_seq, seq_num)
                 
-                if frame_type == CONSECUTIVE_FRAME:
-                    seq_num = data[0] & 0x0F
-                    
-                    if seq_num != expected_seq:
-                        logger.warning(f"Неправильная последовательность CF: ожидалось {expected_seq}, получено {seq_num}")
-                    
-                    # Добавление данных (максимум 7 байт)
-                    remaining = total_length - len(payload)
-                    chunk_len = min(7, remaining)
-                    payload.extend(data[1:1+chunk_len])
-                    
-                    expected_seq = (expected_seq + 1) % 16
-                    logger.debug(f"ISO-TP Consecutive Frame #{seq_num}: +{chunk_len} байт, всего {len(payload)}/{total_length}")
-                    
-                    if len(payload) >= total_length:
-                        logger.info(f"ISO-TP Multi-frame принят: {total_length} байт")
-                        return bytes(payload[:total_length])
-            
-            time.sleep(0.01)
+                # Запись данных по месту (максимум 7 байт на кадр)
+                chunk_len = min(7, total_length - pos, len(data) - 1)
+                mv[pos:pos + chunk_len] = data[1:1 + chunk_len]
+                pos += chunk_len
+                
+                expected_seq = (expected_seq + 1) & 0x0F
+                logger.debug("ISO-TP Consecutive Frame #%d: +%d байт, всего %d/%d", seq_num, chunk_len, pos, total_length)
+                
+                if pos >= total_length:
+                    logger.info("ISO-TP Multi-frame принят: %d байт", total_length)
+                    return bytes(payload)
         
-        return bytes(payload[:total_length])
+        return bytes(payload)
@@ -1,6 +1,8 @@
 """J2534 PassThru API обертка для работы с Tactrix OpenPort 2.0"""
 import ctypes
 import logging
+import queue
+import struct
 import threading
 import time
 from typing import Optional, List, Tuple
@@ -47,8 +49,27 @@ class J2534Wrapper:
         self.filter_id = None
         self._read_thread = None
         self._stop_reading = threading.Event()
-        self._message_queue = []
-        self._queue_lock = threading.Lock()
+        # Принятые кадры раскладываются по очередям на каждый CAN ID:
+        # потребители блокируются на queue.get(timeout=...) вместо
+        # опроса общего списка со sleep-паузами
+        self._rx_queues = {}
+        self._rx_lock = threading.Lock()
+        self._overflow_warned = set()  # CAN ID, по которым уже было предупреждение
+        # Подписанные CAN ID (фильтры + явные очереди): кадры посторонних
+        # ID отбрасываются в потоке чтения, не занимая очереди и память
+        self._subscribed = set()
+        self._last_rx_monotonic = 0.0  # Момент последнего принятого кадра
+        # Переиспользуемый буфер приёма: массив PASSTHRU_MSG (~4 КБ на
+        # слот) не перевыделяется и не зануляется на каждом цикле опроса
+        self._read_buf = None
+        self._read_buf_size = 0
+        self._num_msgs = ctypes.c_ulong()
+        # Переиспользуемая структура отправки (~4 КБ): memset не нужен,
+        # валидный диапазон задаёт DataSize. Блокировка — т.к. писать
+        # могут и основной поток, и фоновый TesterPresent
+        self._tx_msg = PASSTHRU_MSG()
+        self._tx_msg_lock = threading.Lock()
+        self._tx_num_msgs = ctypes.c_ulong()
         
         logger.info(f"Инициализация J2534 с DLL: {dll_path}")
         
@@ -126,6 +147,12 @@ class J2534Wrapper:
             ]
             self.dll.PassThruIoctl.restype = ctypes.c_long
             
+            # Привязка указателей горячих функций: один LOAD_ATTR вместо
+            # двух на каждый вызов в цикле чтения/отправки
+            self._pt_read = self.dll.PassThruReadMsgs
+            self._pt_write = self.dll.PassThruWriteMsgs
+            self._pt_ioctl = self.dll.PassThruIoctl
+            
             logger.info("Прототипы функций J2534 определены")
             
         except Exception as e:
@@ -261,32 +288,25 @@ class J2534Wrapper:
         if self.channel_id is None:
             raise J2534Exception("Канал не подключен")
         
+        # Big-endian CAN ID пишется одним 4-байтовым store вместо
+        # четырёх поэлементных присваиваний в ctypes-массив
         # Маска (все биты значимы для стандартного 11-бит ID)
         mask = PASSTHRU_MSG()
         mask.ProtocolID = ISO15765
         mask.DataSize = 4
-        mask.Data[0] = 0xFF
-        mask.Data[1] = 0xFF
-        mask.Data[2] = 0xFF
-        mask.Data[3] = 0xFF
+        struct.pack_into('>I', mask.Data, 0, 0xFFFFFFFF)
         
         # Паттерн (ID ответа от ЭБУ)
         pattern = PASSTHRU_MSG()
         pattern.ProtocolID = ISO15765
         pattern.DataSize = 4
-        pattern.Data[0] = (response_id >> 24) & 0xFF
-        pattern.Data[1] = (response_id >> 16) & 0xFF
-        pattern.Data[2] = (response_id >> 8) & 0xFF
-        pattern.Data[3] = response_id & 0xFF
+        struct.pack_into('>I', pattern.Data, 0, response_id)
         
         # Flow Control (наш запрос к ЭБУ)
         fc = PASSTHRU_MSG()
         fc.ProtocolID = ISO15765
         fc.DataSize = 4
-        fc.Data[0] = (request_id >> 24) & 0xFF
-        fc.Data[1] = (request_id >> 16) & 0xFF
-        fc.Data[2] = (request_id >> 8) & 0xFF
-        fc.Data[3] = request_id & 0xFF
+        struct.pack_into('>I', fc.Data, 0, request_id)
         
         filter_id = ctypes.c_ulong(0)
         result = self.dll.PassThruStartMsgFilter(
@@ -300,55 +320,119 @@ class J2534Wrapper:
         self._check_error(result, "PassThruStartMsgFilter")
         
         self.filter_id = filter_id.value
+        self._subscribed.add(response_id)
         logger.info(f"Фильтр установлен, FilterID: {self.filter_id}")
         return self.filter_id
     
+    def set_multiple_flow_control_filters(self, pairs) -> List[int]:
+        """Установка flow-control фильтров сразу для нескольких пар CAN ID
+
+        Большинство J2534 адаптеров поддерживают десять и более
+        одновременных фильтров — это позволяет слушать всех кандидатов
+        автопоиска параллельно вместо последовательного перебора.
+        Возвращает список FilterID успешно установленных фильтров.
+        """
+        filter_ids = []
+        for request_id, response_id in pairs:
+            try:
+                filter_ids.append(self.set_flow_control_filter(request_id, response_id))
+            except J2534Exception as e:
+                logger.warning("⚠️ Фильтр для пары 0x%03X/0x%03X не установлен: %s",
+                               request_id, response_id, e)
+        return filter_ids
+
     def write_message(self, can_id: int, data: bytes, timeout: int = 100) -> bool:
         """Отправка CAN сообщения"""
         if self.channel_id is None:
             raise J2534Exception("Канал не подключен")
         
-        msg = PASSTHRU_MSG()
-        msg.ProtocolID = ISO15765
-        msg.TxFlags = 0
-        msg.DataSize = 4 + len(data)  # 4 байта ID + данные
-        
-        # CAN ID (11-бит, стандартный)
-        msg.Data[0] = (can_id >> 24) & 0xFF
-        msg.Data[1] = (can_id >> 16) & 0xFF
-        msg.Data[2] = (can_id >> 8) & 0xFF
-        msg.Data[3] = can_id & 0xFF
-        
-        # Данные
-        for i, byte in enumerate(data):
-            msg.Data[4 + i] = byte
+        with self._tx_msg_lock:
+            msg = self._tx_msg
+            msg.ProtocolID = ISO15765
+            msg.TxFlags = 0
+            msg.DataSize = 4 + len(data)  # 4 байта ID + данные
+            
+            # CAN ID (11-бит, стандартный) — один big-endian store
+            struct.pack_into('>I', msg.Data, 0, can_id)
+            
+            # Данные: один memcpy на C-уровне вместо поэлементного
+            # Python-цикла по ctypes-массиву
+            ctypes.memmove(ctypes.byref(msg.Data, 4), bytes(data), len(data))
+            
+            num_msgs = self._tx_num_msgs
+            num_msgs.value = 1
+            result = self._pt_write(
+                self.channel_id,
+                ctypes.byref(msg),
+                ctypes.byref(num_msgs),
+                timeout
+            )
         
-        num_msgs = ctypes.c_ulong(1)
-        result = self.dll.PassThruWriteMsgs(
+        try:
+            self._check_error(result, "PassThruWriteMsgs")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Отправлено: ID=0x%03X, Data=%s", can_id, data.hex().upper())
+            return True
+        except J2534Exception as e:
+            logger.error(f"Ошибка отправки сообщения: {e}")
+            return False
+    
+    def write_messages(self, can_id: int, frames: List[bytes], timeout: int = 100) -> bool:
+        """Пакетная отправка CAN кадров одним вызовом PassThruWriteMsgs
+
+        Один переход Python→DLL на весь блок кадров вместо вызова на
+        каждый 7-байтовый Consecutive Frame: накладные расходы ctypes
+        (10-50 мкс на вызов) амортизируются по блоку.
+        """
+        if self.channel_id is None:
+            raise J2534Exception("Канал не подключен")
+        if not frames:
+            return True
+
+        n = len(frames)
+        msg_array = (PASSTHRU_MSG * n)()
+        id_bytes = bytes([(can_id >> 24) & 0xFF, (can_id >> 16) & 0xFF,
+                          (can_id >> 8) & 0xFF, can_id & 0xFF])
+        for msg, data in zip(msg_array, frames):
+            msg.ProtocolID = ISO15765
+            msg.TxFlags = 0
+            msg.DataSize = 4 + len(data)
+            msg.Data[0:4] = id_bytes
+            msg.Data[4:4 + len(data)] = data
+
+        num_msgs = ctypes.c_ulong(n)
+        result = self._pt_write(
             self.channel_id,
-            ctypes.byref(msg),
+            ctypes.byref(msg_array),
             ctypes.byref(num_msgs),
             timeout
         )
-        
+
         try:
             self._check_error(result, "PassThruWriteMsgs")
-            logger.debug(f"Отправлено: ID=0x{can_id:03X}, Data={data.hex().upper()}")
+            if num_msgs.value != n:
+                logger.warning(f"⚠️ Отправлено только {num_msgs.value} из {n} кадров")
+                return False
+            logger.debug("Отправлено пакетом: ID=0x%03X, кадров=%d", can_id, n)
             return True
         except J2534Exception as e:
-            logger.error(f"Ошибка отправки сообщения: {e}")
+            logger.error(f"Ошибка пакетной отправки сообщений: {e}")
             return False
-    
+
     def read_messages(self, timeout: int = 100, max_msgs: int = 10) -> List[Tuple[int, bytes]]:
         """Чтение CAN сообщений"""
         if self.channel_id is None:
             raise J2534Exception("Канал не подключен")
         
         messages = []
-        msg_array = (PASSTHRU_MSG * max_msgs)()
-        num_msgs = ctypes.c_ulong(max_msgs)
+        if max_msgs > self._read_buf_size:
+            self._read_buf = (PASSTHRU_MSG * max_msgs)()
+            self._read_buf_size = max_msgs
+        msg_array = self._read_buf
+        num_msgs = self._num_msgs
+        num_msgs.value = max_msgs
         
-        result = self.dll.PassThruReadMsgs(
+        result = self._pt_read(
             self.channel_id,
             ctypes.byref(msg_array),
             ctypes.byref(num_msgs),
@@ -359,19 +443,21 @@ class J2534Wrapper:
         if result != STATUS_NOERROR and result != ERR_BUFFER_EMPTY:
             self._check_error(result, "PassThruReadMsgs")
         
-        # Обработка полученных сообщений
+        # Обработка полученных сообщений (hex-дамп форматируется только
+        # при включённом DEBUG — флаг снимается один раз до цикла)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         for i in range(num_msgs.value):
             msg = msg_array[i]
             
-            # Извлечение CAN ID (первые 4 байта)
-            can_id = (msg.Data[0] << 24) | (msg.Data[1] << 16) | (msg.Data[2] << 8) | msg.Data[3]
-            
-            # Извлечение данных (после ID)
-            data_len = msg.DataSize - 4
-            data = bytes(msg.Data[4:4+data_len])
+            # Извлечение ID и данных одним memcpy через string_at:
+            # срез ctypes-массива строит промежуточный list из int
+            base = ctypes.addressof(msg.Data)
+            can_id = int.from_bytes(ctypes.string_at(base, 4), 'big')
+            data = ctypes.string_at(base + 4, msg.DataSize - 4)
             
             messages.append((can_id, data))
-            logger.debug(f"Получено: ID=0x{can_id:03X}, Data={data.hex().upper()}")
+            if debug_enabled:
+                logger.debug("Получено: ID=0x%03X, Data=%s", can_id, data.hex().upper())
         
         return messages
     
@@ -397,25 +483,107 @@ class J2534Wrapper:
         """Цикл чтения сообщений в фоновом потоке"""
         while not self._stop_reading.is_set():
             try:
-                messages = self.read_messages(timeout=50, max_msgs=10)
+                # Ожидание внутри драйвера: PassThruReadMsgs блокируется до
+                # 500 мс и возвращается раньше при поступлении данных —
+                # вместо ~20 ctypes-вызовов в секунду на пустой шине
+                messages = self.read_messages(timeout=500, max_msgs=10)
                 if messages:
-                    with self._queue_lock:
-                        self._message_queue.extend(messages)
+                    self._last_rx_monotonic = time.monotonic()
+                    for can_id, data in messages:
+                        # Быстрый отсев неподписанных ID (set-проверка —
+                        # питоний аналог битовой карты подписок)
+                        if can_id not in self._subscribed:
+                            continue
+                        q = self.rx_queue(can_id)
+                        try:
+                            q.put_nowait(data)
+                        except queue.Full:
+                            # Вытеснение самого старого кадра: память очереди
+                            # фиксирована, предупреждение — один раз на ID
+                            if can_id not in self._overflow_warned:
+                                self._overflow_warned.add(can_id)
+                                logger.warning(f"⚠️ Переполнение очереди CAN ID 0x{can_id:03X}, старые кадры вытесняются")
+                            try:
+                                q.get_nowait()
+                            except queue.Empty:
+                                pass
+                            try:
+                                q.put_nowait(data)
+                            except queue.Full:
+                                pass
             except Exception as e:
                 logger.error(f"Ошибка в потоке чтения: {e}")
                 time.sleep(0.1)
     
-    def get_queued_messages(self, can_id: Optional[int] = None) -> List[Tuple[int, bytes]]:
-        """Получение сообщений из очереди"""
-        with self._queue_lock:
-            if can_id is None:
-                messages = self._message_queue[:]
-                self._message_queue.clear()
+    def rx_queue(self, can_id: int) -> queue.Queue:
+        """Очередь принятых кадров для конкретного CAN ID (лениво создаётся)
+
+        Потребитель может блокироваться на q.get(timeout=...) и будет
+        разбужен потоком чтения сразу при поступлении кадра — без
+        фиксированной 10-мс гранулярности sleep-опроса.
+
+        Горячий путь без блокировки: dict.get атомарен под GIL, поэтому
+        _rx_lock берётся только при первом обращении к новому CAN ID —
+        поток чтения и потребители не сериализуются на каждом кадре.
+        """
+        q = self._rx_queues.get(can_id)
+        if q is not None:
+            return q
+        with self._rx_lock:
+            q = self._rx_queues.get(can_id)
+            if q is None:
+                q = self._rx_queues[can_id] = queue.Queue(maxsize=config.RX_QUEUE_MAXSIZE)
+                self._subscribed.add(can_id)
+            return q
+
+    def drain_one(self, can_id: int, timeout: float = 0.0) -> Optional[Tuple[int, bytes]]:
+        """Извлечение одного принятого кадра без материализации списка
+
+        При timeout > 0 блокируется до поступления кадра (или истечения
+        времени); возвращает (can_id, data) либо None.
+        """
+        try:
+            if timeout > 0:
+                data = self.rx_queue(can_id).get(timeout=timeout)
             else:
-                messages = [(mid, data) for mid, data in self._message_queue if mid == can_id]
-                self._message_queue = [(mid, data) for mid, data in self._message_queue if mid != can_id]
+                data = self.rx_queue(can_id).get_nowait()
+        except queue.Empty:
+            return None
+        return (can_id, data)
+
+    def get_queued_messages(self, can_id: Optional[int] = None) -> List[Tuple[int, bytes]]:
+        """Неблокирующий слив очередей принятых сообщений"""
+        messages = []
+        if can_id is None:
+            with self._rx_lock:
+                queues = list(self._rx_queues.items())
+        else:
+            queues = [(can_id, self.rx_queue(can_id))]
+
+        for cid, q in queues:
+            while True:
+                try:
+                    messages.append((cid, q.get_nowait()))
+                except queue.Empty:
+                    break
         return messages
     
+    def wait_buffers_clear(self, timeout: float = 0.3, idle: float = 0.02):
+        """Ожидание затишья на шине с последующей очисткой буферов
+
+        Возвращает управление, как только от адаптера не приходит новых
+        кадров в течение idle секунд (вместо фиксированной паузы «на
+        всякий случай»), либо по истечении timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if time.monotonic() - self._last_rx_monotonic >= idle:
+                break
+            time.sleep(0.005)
+
+        self.clear_buffers()
+        self.get_queued_messages()  # Сброс накопленных кадров
+
     def clear_buffers(self):
         """Очистка буферов TX/RX"""
         if self.channel_id is None:
@@ -423,9 +591,9 @@ class J2534Wrapper:
         
         try:
             # Очистка TX буфера
-            self.dll.PassThruIoctl(self.channel_id, CLEAR_TX_BUFFER, None, None)
+            self._pt_ioctl(self.channel_id, CLEAR_TX_BUFFER, None, None)
             # Очистка RX буфера
-            self.dll.PassThruIoctl(self.channel_id, CLEAR_RX_BUFFER, None, None)
+            self._pt_ioctl(self.channel_id, CLEAR_RX_BUFFER, None, None)
             logger.debug("Буферы очищены")
         except Exception as e:
             logger.warning(f"Ошибка очистки буферов: {e}")
@@ -474,7 +642,7 @@ class J2534Wrapper:
             "filter_id": self.filter_id,
             "dll_path": self.dll_path,
             "read_thread_alive": self._read_thread.is_alive() if self._read_thread else False,
-            "message_queue_size": len(self._message_queue),
+            "message_queue_size": sum(q.qsize() for q in self._rx_queues.values()),
             "health_status": "OK" if self.health_check() else "FAILED"
         }
     
@@ -23,24 +23,55 @@
     python main.py --read-vin --scan --ecu-info --verbose
 """
 
+import atexit
 import sys
 import logging
+import logging.handlers
 import argparse
 import os
+import queue
 import traceback
+import types
 
 # Добавление текущей директории в PYTHONPATH
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import config
-from harley_diagnostics import HarleyDiagnostics
-from error_handler import global_error_handler, ErrorSeverity, ErrorCategory, DiagnosticError
-from diagnostic_report import global_diagnostic_reporter
+
+# Тяжёлые диагностические модули (ctypes-привязки J2534, генератор
+# отчётов) импортируются лениво внутри main(): --help и ошибки
+# аргументов не платят за их загрузку
+
+logger = logging.getLogger(__name__)
+
+# Уровень лога из config вычисляется один раз при импорте модуля
+_LOG_LEVEL_CACHED = getattr(logging, config.LOG_LEVEL, logging.INFO)
+
+# Наши модули, которым setup_logging выставляет уровень
+_OUR_MODULES = ('j2534_wrapper', 'isotp_handler', 'uds_client', 'harley_diagnostics')
+
+# Генерация отчётов о сбоях: флаг снимается с config один раз при импорте
+ENABLE_REPORTING = getattr(config, 'ENABLE_DIAGNOSTIC_REPORTS', False)
+
+# Баннер и эпилог справки — замороженные константы модуля
+_BANNER = """
+╭────────────────────────────────────────────────────────────╮
+│     Harley-Davidson XG750A Diagnostic Tool                    │
+│     Tactrix OpenPort 2.0 + J2534 + UDS/ISO-TP                │
+│     © 2025                                                     │
+╰────────────────────────────────────────────────────────────╯
+"""
+_EPILOG = __doc__
 
 
 def setup_logging(verbose: bool = False):
-    """Настройка логирования"""
-    level = logging.DEBUG if verbose else getattr(logging, config.LOG_LEVEL)
+    """Настройка логирования
+
+    Вывод в консоль/файл вынесен в фоновый поток через QueueHandler +
+    QueueListener: горячие циклы (сканирование DID) лишь кладут запись
+    в очередь вместо синхронной записи на диск/терминал.
+    """
+    level = logging.DEBUG if verbose else _LOG_LEVEL_CACHED
     
     # Формат лога
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -48,40 +79,76 @@ def setup_logging(verbose: bool = False):
     
     handlers = [logging.StreamHandler(sys.stdout)]
     
-    # Добавление логирования в файл
+    # Добавление логирования в файл. delay=True: файл открывается лениво,
+    # при первой реально записанной строке — --help и ошибки аргументов
+    # не трогают диск
     if config.LOG_TO_FILE:
-        handlers.append(logging.FileHandler(config.LOG_FILE, encoding='utf-8'))
+        handlers.append(logging.FileHandler(config.LOG_FILE, encoding='utf-8', delay=True))
     
-    logging.basicConfig(
-        level=level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=handlers
-    )
+    formatter = logging.Formatter(log_format, datefmt=date_format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers,
+                                              respect_handler_level=True)
+    listener.start()
+    # Гарантированный слив очереди при любом завершении процесса
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
     
-    # Установка уровня для наших модулей
-    for module in ['j2534_wrapper', 'isotp_handler', 'uds_client', 'harley_diagnostics']:
-        logging.getLogger(module).setLevel(level)
+    # Установка уровня для наших модулей: один захват глобальной
+    # блокировки logging вместо четырёх
+    with logging._lock:
+        for name in _OUR_MODULES:
+            lg = logging.Logger.manager.loggerDict.get(name)
+            if isinstance(lg, logging.Logger):
+                lg.setLevel(level)
+            else:
+                logging.getLogger(name).setLevel(level)
+
+
+def _fast_parse(argv):
+    """Быстрый разбор типовых одиночных вызовов без argparse
+
+    Построение ArgumentParser с восемью опциями и RawDescription-эпилогом
+    стоит миллисекунды чистого Python на каждый запуск; для скриптовых
+    циклов (GUI, CI-матрица) простые формы argv разбираются вручную.
+    Возвращает None для всего, что требует полного парсера.
+    """
+    defaults = {
+        'read_vin': False, 'scan': False, 'read_odometer': None,
+        'ecu_info': False, 'scan_range': None, 'verbose': False,
+        'auto_detect': False, 'save_params': None,
+    }
+    if argv == ['--read-vin']:
+        return types.SimpleNamespace(**{**defaults, 'read_vin': True})
+    if argv == ['--ecu-info']:
+        return types.SimpleNamespace(**{**defaults, 'ecu_info': True})
+    if len(argv) == 2 and argv[0] == '--read-odometer':
+        return types.SimpleNamespace(**{**defaults, 'read_odometer': argv[1]})
+    return None
 
 
 def print_banner():
     """Вывод баннера"""
-    banner = """
-╭────────────────────────────────────────────────────────────╮
-│     Harley-Davidson XG750A Diagnostic Tool                    │
-│     Tactrix OpenPort 2.0 + J2534 + UDS/ISO-TP                │
-│     © 2025                                                     │
-╰────────────────────────────────────────────────────────────╯
-    """
-    print(banner)
+    sys.stdout.write(_BANNER)
 
 
 def main():
     """Главная функция с улучшенной обработкой ошибок"""
+    args = _fast_parse(sys.argv[1:])
+    if args is not None:
+        _run(args)
+        return
+    
     parser = argparse.ArgumentParser(
         description='Harley-Davidson XG750A Diagnostic Tool',
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=__doc__
+        epilog=_EPILOG
     )
     
     parser.add_argument('--read-vin', action='store_true',
@@ -110,17 +177,30 @@ def main():
     
     args = parser.parse_args()
     
+    # Если нет аргументов, выводим справку
+    if not any([args.read_vin, args.scan, args.read_odometer, args.ecu_info]):
+        setup_logging(args.verbose)
+        print_banner()
+        parser.print_help()
+        print("\n⚠️  Не указано ни одной операции. Используйте --help для помощи.")
+        sys.exit(1)
+    
+    _run(args)
+
+
+def _run(args):
+    """Выполнение запрошенных операций (общая часть обоих путей разбора)"""
     # Настройка логирования
     setup_logging(args.verbose)
     
     # Вывод баннера
     print_banner()
     
-    # Если нет аргументов, выводим справку
-    if not any([args.read_vin, args.scan, args.read_odometer, args.ecu_info]):
-        parser.print_help()
-        print("\n⚠️  Не указано ни одной операции. Используйте --help для помощи.")
-        sys.exit(1)
+    # Ленивый импорт рабочих модулей — только когда операция действительно
+    # будет выполняться
+    from harley_diagnostics import HarleyDiagnostics
+    from error_handler import global_error_handler, ErrorSeverity, ErrorCategory, DiagnosticError
+    from diagnostic_report import get_reporter
     
     diag = None
     operation_successful = False
@@ -151,10 +231,10 @@ def main():
             print("  - Изучите логи в директории: logs/")
             
             # Генерация отчёта о проблеме
-            if config.ENABLE_DIAGNOSTIC_REPORTS:
+            if ENABLE_REPORTING:
                 print("\n📄 Генерация диагностического отчёта...")
                 try:
-                    report_path = global_diagnostic_reporter.generate_report(
+                    report_path = get_reporter().generate_report(
                         global_error_handler,
                         connection_state={"status": "failed"},
                         operation_context={"operation": "connection", "auto_detect": args.auto_detect}
@@ -192,9 +272,13 @@ def main():
                 try:
                     ecu_info = diag.read_ecu_info()
                     if ecu_info:
-                        print("\n📊 Информация о ЭБУ:")
+                        # Один write вместо print на строку: без захвата
+                        # блокировки stdout и syscall на каждую запись
+                        lines = ["\n📊 Информация о ЭБУ:\n"]
                         for key, value in ecu_info.items():
-                            print(f"  {key}: {value}")
+                            lines.append(f"  {key}: {value}\n")
+                        sys.stdout.write(''.join(lines))
+                        sys.stdout.flush()
                         operations_performed.append(("ecu_info", "success"))
                     else:
                         print("\n⚠️ Информация о ЭБУ недоступна")
@@ -223,15 +307,16 @@ def main():
                     results = diag.scan_for_odometer(start, end)
                     
                     if results:
-                        print(f"\n🔍 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:")
-                        print("="*60)
+                        lines = ["\n🔍 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:\n", "=" * 60, "\n"]
                         for did, data in results.items():
-                            print(f"\n  DID 0x{did:04X}:")
-                            print(f"    Raw: {data['raw_data']}")
-                            print(f"    Возможные значения:")
+                            lines.append(f"\n  DID 0x{did:04X}:\n"
+                                         f"    Raw: {data['raw_data']}\n"
+                                         f"    Возможные значения:\n")
                             for interp in data['possible_values']:
-                                print(f"      - {interp}")
-                        print("\n" + "="*60)
+                                lines.append(f"      - {interp}\n")
+                        lines.append("\n" + "=" * 60 + "\n")
+                        sys.stdout.write(''.join(lines))
+                        sys.stdout.flush()
                         operations_performed.append(("scan", "success"))
                     else:
                         print("\n⚠️ Не найдено доступных DIDs")
@@ -252,11 +337,13 @@ def main():
                     result = diag.read_odometer(did)
                     
                     if result:
-                        print(f"\n📍 Одометр (DID 0x{did:04X}):")
-                        print(f"  Raw: {result['raw_data']}")
-                        print(f"  Возможные значения:")
+                        lines = [f"\n📍 Одометр (DID 0x{did:04X}):\n",
+                                 f"  Raw: {result['raw_data']}\n",
+                                 "  Возможные значения:\n"]
                         for interp in result['interpretations']:
-                            print(f"    - {interp}")
+                            lines.append(f"    - {interp}\n")
+                        sys.stdout.write(''.join(lines))
+                        sys.stdout.flush()
                         operations_performed.append(("read_odometer", "success"))
                     else:
                         print(f"\n⚠️ Не удалось прочитать одометр (DID 0x{did:04X})")
@@ -339,10 +426,10 @@ def main():
         logger.critical(f"Диагностическая ошибка: {e.message}", exc_info=True)
         
         # Генерация отчёта при критических ошибках
-        if config.ENABLE_DIAGNOSTIC_REPORTS and e.severity in [ErrorSeverity.CRITICAL, ErrorSeverity.FATAL]:
+        if ENABLE_REPORTING and e.severity in [ErrorSeverity.CRITICAL, ErrorSeverity.FATAL]:
             try:
                 print("\n📄 Генерация диагностического отчёта...")
-                report_path = global_diagnostic_reporter.generate_report(
+                report_path = get_reporter().generate_report(
                     global_error_handler,
                     operation_context={"error": e.message, "category": e.category.value}
                 )
@@ -368,10 +455,10 @@ def main():
         )
         
         # Генерация отчёта при критических ошибках
-        if config.ENABLE_DIAGNOSTIC_REPORTS:
+        if ENABLE_REPORTING:
             try:
                 print("\n📄 Генерация диагностического отчёта...")
-                report_path = global_diagnostic_reporter.generate_report(
+                report_path = get_reporter().generate_report(
                     global_error_handler,
                     operation_context={"error": str(e), "traceback": traceback.format_exc()}
                 )
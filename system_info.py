@@ -0,0 +1,26 @@
+"""Кэшированная информация о системе (ОС, Python, архитектура)
+
+Функции platform.* не кэшируются в stdlib и на Windows могут порождать
+syscall'ы или даже подпроцессы; здесь все значения собираются один раз
+на процесс и переиспользуются всеми модулями.
+"""
+
+import functools
+import platform
+import sys
+from types import SimpleNamespace
+
+
+@functools.lru_cache(maxsize=1)
+def get_system_info() -> SimpleNamespace:
+    """Сбор информации о системе (выполняется один раз на процесс)"""
+    return SimpleNamespace(
+        os=platform.system(),
+        release=platform.release(),
+        version=platform.version(),
+        machine=platform.machine(),
+        py_version=sys.version.split()[0],
+        is_32bit=sys.maxsize <= 2 ** 32,
+        py_arch='32-bit' if sys.maxsize <= 2 ** 32 else '64-bit',
+        executable=sys.executable,
+    )
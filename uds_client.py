@@ -1,5 +1,8 @@
 """UDS (Unified Diagnostic Services) клиент для диагностики ЭБУ"""
+import collections
+import functools
 import logging
+import struct
 import threading
 import time
 from typing import Optional, Dict, Any
@@ -32,6 +35,29 @@ POSITIVE_RESPONSE_OFFSET = 0x40
 # UDS отрицательный ответ
 NEGATIVE_RESPONSE = 0x7F
 
+# Предсобранные субфункции TesterPresent: фоновый цикл не аллоцирует
+# одни и те же байты на каждый тик
+_TP_SUPPRESS = bytes([0x80])
+_TP_RESPOND = bytes([0x00])
+
+# Готовый кадр TesterPresent с подавлением ответа — фоновый цикл шлёт
+# его напрямую через ISO-TP, минуя сборку/валидацию send_request
+_TP_FRAME = bytes([TESTER_PRESENT]) + _TP_SUPPRESS
+
+# Бюджет повторов отправки ISO-TP в send_request (сек)
+_SEND_BUDGET_S = 0.5
+
+# Максимум подряд NRC 0x78 (response pending) на один запрос
+_MAX_PENDING = 20
+
+# Глубина конвейера scan_dids: сколько запросов 0x22 держится «в полёте»
+# одновременно; отправка и приём перекрываются, как submit/complete
+_SCAN_PIPELINE_DEPTH = 4
+
+# Каждый N-й тик фонового цикла идёт полным send_request: подавленный
+# ответ не подтверждается, полный путь выявляет мёртвый линк
+_TP_FULL_CHECK_EVERY = 10
+
 # Negative Response Codes (NRC)
 NRC_DESCRIPTIONS = {
     0x10: "General reject",
@@ -47,155 +73,288 @@ NRC_DESCRIPTIONS = {
     0x78: "Request correctly received but response is pending"
 }
 
+# Таблица NRC с индексом-байтом: кортежный доступ вместо хеширования
+# словаря на каждый отрицательный ответ
+_NRC_TABLE = tuple(NRC_DESCRIPTIONS.get(i) for i in range(256))
+
+
+# SID 0x22 одним байтом для конкатенации с _DID_BYTES в конвейере
+_READ_DID_SID = bytes([READ_DATA_BY_IDENTIFIER])
+
+# Все 65536 big-endian представлений DID, собранные один раз:
+# сканы не аллоцируют новый 2-байтовый bytes на каждый запрос
+# (~128 КБ памяти однократно против 65536 аллокаций за полный проход)
+_DID_BYTES = tuple(i.to_bytes(2, 'big') for i in range(0x10000))
+
+# Помеченный результат UDS запроса: ok/data/nrc вместо исключения.
+# raise на каждый отрицательный ответ стоит захвата traceback (~мкс) —
+# при сканах с тысячами NRC 0x31 это тысячи лишних аллокаций
+UDSResponse = collections.namedtuple('UDSResponse', 'ok data nrc')
+
+# Общий экземпляр «нет ответа»: namedtuple неизменяем, аллокация не нужна
+_RESP_NONE = UDSResponse(False, None, None)
+
+
+@functools.lru_cache(maxsize=512)
+def _fmt_sid(sid: int) -> str:
+    """Hex-строка SID/NRC для контекста ошибок (одни и те же байты
+    форматируются при каждом сбое — кэш снимает f-string с горячего пути)"""
+    return f"0x{sid:02X}"
+
+
+@functools.lru_cache(maxsize=512)
+def _fmt_did(did: int) -> str:
+    """Hex-строка DID для контекста ошибок (см. _fmt_sid)"""
+    return f"0x{did:04X}"
+
 
 class UDSException(Exception):
-    """Исключение для ошибок UDS"""
-    pass
+    """Исключение для ошибок UDS
+
+    Атрибут nrc содержит код отрицательного ответа (или None, если
+    исключение не связано с NRC) — по нему вызывающий код может выбрать
+    стратегию повтора.
+    """
+
+    def __init__(self, message: str, nrc: Optional[int] = None):
+        super().__init__(message)
+        self.nrc = nrc
 
 
 class UDSClient:
     """Клиент UDS для диагностики ЭБУ"""
     
+    # Без per-instance __dict__: меньше памяти и короче цепочка поиска
+    # атрибутов (send_request трогает self.isotp на каждом запросе)
+    __slots__ = (
+        'isotp', 'current_session', 'last_tester_present', 'last_nrc',
+        '_tester_present_thread', '_tp_enabled', '_tp_interrupt',
+        '_tp_interval', '_tp_lock', '_tp_ticks',
+        '_did_cache', '_did_cache_lock', '_did_cache_ttl',
+        '_iso_tp_timeout', '_p2_star_timeout',
+    )
+    
     def __init__(self, isotp_handler: ISOTPHandler):
         self.isotp = isotp_handler
         self.current_session = DEFAULT_SESSION
+        self.last_tester_present = 0.0  # time.monotonic() последнего успешного TP
+        # NRC последнего ответа (None при положительном ответе): по нему
+        # вызывающий код адаптирует темп запросов (0x21/0x78 — ЭБУ занят)
+        self.last_nrc = None
+        # Один TesterPresent-поток на клиента, создаётся лениво при первом
+        # старте и живёт дальше: start/stop лишь переключают Event-гейт,
+        # без повторного создания потока на каждую попытку подключения
         self._tester_present_thread = None
-        self._stop_tester_present = threading.Event()
+        self._tp_enabled = threading.Event()
+        # Прерывает межкадровую паузу TP-цикла при остановке: поток не
+        # досыпает интервал и не шлёт устаревший TesterPresent
+        self._tp_interrupt = threading.Event()
+        self._tp_interval = config.TESTER_PRESENT_INTERVAL
+        # Атомарный старт/стоп TP-потока: без блокировки два конкурентных
+        # start_tester_present могли бы породить два потока
+        self._tp_lock = threading.Lock()
+        self._tp_ticks = 0
+        # Короткоживущий кэш ответов {did: (монотонное время, данные)}:
+        # повторные чтения одного DID в окне TTL не выходят на шину.
+        # Блокировка — кэш трогают и основной, и TesterPresent потоки
+        self._did_cache = {}
+        self._did_cache_lock = threading.Lock()
+        self._did_cache_ttl = config.DID_CACHE_TTL
+        # Таймауты из config, снятые в атрибуты: send_request не ходит
+        # за ними через модульный словарь на каждый запрос
+        self._iso_tp_timeout = config.ISO_TP_TIMEOUT
+        self._p2_star_timeout = config.UDS_P2_STAR_TIMEOUT
         
         logger.info("UDS клиент инициализирован")
     
-    def send_request(self, service_id: int, data: bytes = b'', timeout: Optional[int] = None) -> Optional[bytes]:
-        """Отправка UDS запроса и получение ответа с обработкой ошибок"""
+    def send_request(self, service_id: int, data: bytes = b'', timeout: Optional[int] = None,
+                     quiet: bool = False) -> Optional[bytes]:
+        """Отправка UDS запроса и получение ответа с обработкой ошибок
+
+        Совместимая обёртка над send_request_tagged: отрицательный ответ
+        поднимается как UDSException. quiet=True пропускает дорогой путь
+        обработки ошибки по таймауту — для массовых опросов, где
+        отсутствие ответа является нормой.
+        """
+        resp = self.send_request_tagged(service_id, data, timeout=timeout, quiet=quiet)
+        if resp.nrc is not None:
+            nrc_desc = _NRC_TABLE[resp.nrc] or f"Unknown NRC: 0x{resp.nrc:02X}"
+            raise UDSException(f"Negative response: {nrc_desc} (0x{resp.nrc:02X})", nrc=resp.nrc)
+        return resp.data
+
+    def send_request_tagged(self, service_id: int, data: bytes = b'',
+                            timeout: Optional[int] = None,
+                            quiet: bool = False) -> UDSResponse:
+        """Отправка UDS запроса с помеченным результатом вместо исключения
+
+        Возвращает UDSResponse(ok, data, nrc): отрицательный ответ — это
+        обычное значение с заполненным nrc, без raise и захвата traceback
+        на горячем пути сканирования. Исключения остаются только для
+        действительно исключительных случаев (мёртвый транспорт).
+        """
         try:
-            request = bytes([service_id]) + data
-            logger.debug(f"UDS Request: {request.hex().upper()}")
+            # Сборка запроса в одном буфере вместо двух промежуточных bytes
+            buf = bytearray(1 + len(data))
+            buf[0] = service_id
+            buf[1:] = data
+            request = bytes(buf)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("UDS Request: %s", request.hex().upper())
             
             # Валидация запроса
             if len(request) > 4095:  # Максимальный размер UDS сообщения
                 raise ValueError(f"UDS запрос слишком большой: {len(request)} байт")
             
-            # Отправка через ISO-TP с retry
-            send_attempts = 0
-            max_send_attempts = 2
-            
-            while send_attempts < max_send_attempts:
+            # Отправка через ISO-TP: экспоненциальный backoff (2→8→32→50 мс)
+            # в пределах монотонного бюджета вместо фиксированных 100 мс —
+            # кратковременная занятость шины отыгрывается за миллисекунды
+            deadline = time.monotonic() + _SEND_BUDGET_S
+            delay = 0.002
+            sent = False
+            while True:
                 if self.isotp.send(request):
+                    sent = True
                     break
-                send_attempts += 1
-                if send_attempts < max_send_attempts:
-                    logger.warning(f"⚠️ Повтор отправки UDS запроса (попытка {send_attempts + 1})")
-                    time.sleep(0.1)
-            else:
+                if time.monotonic() >= deadline:
+                    break
+                logger.warning("⚠️ Повтор отправки UDS запроса через %.0f мс", delay * 1000)
+                time.sleep(delay)
+                delay = min(delay * 4, 0.05)
+            if not sent:
                 error = Exception("Не удалось отправить UDS запрос")
-                global_error_handler.handle_error(
+                global_error_handler.handle_error_async(
                     error,
                     severity=ErrorSeverity.RECOVERABLE,
                     category=ErrorCategory.PROTOCOL,
-                    context={"service_id": f"0x{service_id:02X}"},
+                    context={"service_id": _fmt_sid(service_id)},
                     recovery_hint="Проверьте соединение с ЭБУ"
                 )
-                return None
+                return _RESP_NONE
             
-            # Прием ответа
+            # Прием ответа. NRC 0x78 (response pending) по ISO 14229 —
+            # не отказ: ждём следующий кадр на тот же запрос с расширенным
+            # таймаутом P2*, не пересылая запрос и не переделывая ISO-TP
             if timeout is None:
-                timeout = config.ISO_TP_TIMEOUT
+                timeout = self._iso_tp_timeout
             
-            response = self.isotp.receive(timeout=timeout)
+            pending_count = 0
+            while True:
+                response = self.isotp.receive(timeout=timeout, quiet=quiet)
+                if response is not None and len(response) >= 3 \
+                        and response[0] == NEGATIVE_RESPONSE and response[2] == 0x78:
+                    pending_count += 1
+                    if pending_count <= _MAX_PENDING:
+                        self.last_nrc = 0x78
+                        logger.debug("NRC 0x78: ответ в обработке (%d), ожидание до P2*", pending_count)
+                        timeout = self._p2_star_timeout
+                        continue
+                break
             
             if response is None:
+                if quiet:
+                    logger.debug("Нет ответа на сервис 0x%02X", service_id)
+                    return _RESP_NONE
                 error = Exception(f"Timeout ожидания UDS ответа (SID 0x{service_id:02X})")
-                global_error_handler.handle_error(
+                global_error_handler.handle_error_async(
                     error,
                     severity=ErrorSeverity.RECOVERABLE,
                     category=ErrorCategory.TIMEOUT,
-                    context={"service_id": f"0x{service_id:02X}", "timeout": timeout},
+                    context={"service_id": _fmt_sid(service_id), "timeout": timeout},
                     recovery_hint="Увеличьте timeout или проверьте связь с ЭБУ"
                 )
-                return None
+                return _RESP_NONE
             
-            logger.debug(f"UDS Response: {response.hex().upper()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("UDS Response: %s", response.hex().upper())
             
             # Проверка ответа
             if len(response) < 1:
                 logger.error("Пустой ответ UDS")
-                return None
+                return _RESP_NONE
             
             response_sid = response[0]
+            positive_sid = service_id + POSITIVE_RESPONSE_OFFSET
             
             # Положительный ответ
-            if response_sid == service_id + POSITIVE_RESPONSE_OFFSET:
-                logger.info(f"✅ UDS положительный ответ на сервис 0x{service_id:02X}")
-                return response[1:]  # Возвращаем данные без SID
+            if response_sid == positive_sid:
+                self.last_nrc = None
+                logger.info("✅ UDS положительный ответ на сервис 0x%02X", service_id)
+                return UDSResponse(True, response[1:], None)  # Данные без SID
             
             # Отрицательный ответ
             elif response_sid == NEGATIVE_RESPONSE:
                 if len(response) >= 3:
                     requested_sid = response[1]
                     nrc = response[2]
-                    nrc_desc = NRC_DESCRIPTIONS.get(nrc, f"Unknown NRC: 0x{nrc:02X}")
-                    logger.error(f"❌ UDS отрицательный ответ: SID=0x{requested_sid:02X}, NRC=0x{nrc:02X} ({nrc_desc})")
+                    self.last_nrc = nrc
+                    nrc_desc = _NRC_TABLE[nrc] or f"Unknown NRC: 0x{nrc:02X}"
+                    logger.error("❌ UDS отрицательный ответ: SID=0x%02X, NRC=0x%02X (%s)", requested_sid, nrc, nrc_desc)
                     
                     # Определение серьёзности на основе NRC
                     severity = ErrorSeverity.WARNING if nrc == 0x78 else ErrorSeverity.RECOVERABLE
                     
-                    error = UDSException(f"Negative response: {nrc_desc} (0x{nrc:02X})")
-                    global_error_handler.handle_error(
+                    error = UDSException(f"Negative response: {nrc_desc} (0x{nrc:02X})", nrc=nrc)
+                    global_error_handler.handle_error_async(
                         error,
                         severity=severity,
                         category=ErrorCategory.PROTOCOL,
-                        context={"nrc": f"0x{nrc:02X}", "service_id": f"0x{service_id:02X}"}
+                        context={"nrc": _fmt_sid(nrc), "service_id": _fmt_sid(service_id)}
                     )
-                    raise error
+                    return UDSResponse(False, None, nrc)
                 else:
                     logger.error("Некорректный отрицательный ответ UDS")
-                    return None
+                    return _RESP_NONE
             
             else:
-                logger.warning(f"⚠️ Неожиданный SID ответа: 0x{response_sid:02X}")
-                return response
+                logger.warning("⚠️ Неожиданный SID ответа: 0x%02X", response_sid)
+                return UDSResponse(True, response, None)
                 
-        except UDSException:
-            raise  # Пробрасываем UDSException дальше
         except Exception as e:
             global_error_handler.handle_error(
                 e,
                 severity=ErrorSeverity.RECOVERABLE,
                 category=ErrorCategory.PROTOCOL,
-                context={"service_id": f"0x{service_id:02X}"}
+                context={"service_id": _fmt_sid(service_id)}
             )
             raise
     
     def diagnostic_session_control(self, session_type: int = EXTENDED_DIAGNOSTIC_SESSION) -> bool:
         """Управление диагностической сессией (0x10)"""
-        logger.info(f"Переключение в сессию: 0x{session_type:02X}")
+        logger.info("Переключение в сессию: 0x%02X", session_type)
         
-        try:
-            response = self.send_request(DIAGNOSTIC_SESSION_CONTROL, bytes([session_type]))
-            if response is not None:
-                self.current_session = session_type
-                logger.info(f"Диагностическая сессия установлена: 0x{session_type:02X}")
-                return True
-            return False
-        except UDSException as e:
-            logger.error(f"Ошибка переключения сессии: {e}")
-            return False
+        resp = self.send_request_tagged(DIAGNOSTIC_SESSION_CONTROL, bytes([session_type]))
+        if resp.ok:
+            self.current_session = session_type
+            # Смена сессии может изменить видимость/значения DID
+            self.invalidate_did()
+            logger.info("Диагностическая сессия установлена: 0x%02X", session_type)
+            return True
+        if resp.nrc is not None:
+            logger.error("Ошибка переключения сессии: NRC=0x%02X", resp.nrc)
+        return False
     
     def tester_present(self, suppress_response: bool = True) -> bool:
         """Отправка TesterPresent (0x3E) для поддержания сессии"""
-        sub_function = 0x00 if not suppress_response else 0x80
+        sub_function = _TP_SUPPRESS if suppress_response else _TP_RESPOND
         
-        try:
-            response = self.send_request(TESTER_PRESENT, bytes([sub_function]), timeout=500)
-            if response is not None or suppress_response:
-                logger.debug("TesterPresent отправлен")
-                return True
-            return False
-        except UDSException:
+        resp = self.send_request_tagged(TESTER_PRESENT, sub_function, timeout=500)
+        if resp.nrc is not None:
             logger.warning("Ошибка TesterPresent")
             return False
+        if resp.ok or suppress_response:
+            self.last_tester_present = time.monotonic()
+            logger.debug("TesterPresent отправлен")
+            return True
+        return False
     
-    def read_data_by_identifier(self, did: int) -> Optional[bytes]:
-        """Чтение данных по идентификатору (0x22) с retry механизмом"""
+    def read_data_by_identifier(self, did: int, timeout: int = 2000,
+                                quiet: bool = False) -> Optional[bytes]:
+        """Чтение данных по идентификатору (0x22) с retry механизмом
+
+        timeout (мс) позволяет коротким зондам (проверка кандидата CAN ID,
+        верификация соединения) не платить полный ISO-TP таймаут на
+        заведомо молчащем адресе.
+        """
         
         # Валидация DID
         if did < 0 or did > 0xFFFF:
@@ -208,96 +367,320 @@ class UDSClient:
             )
             return None
         
-        did_bytes = bytes([did >> 8, did & 0xFF])
-        logger.info(f"🔍 Чтение DID: 0x{did:04X}")
+        # Кэш с малым TTL: каждый UDS round-trip стоит ~10 мс на шине
+        with self._did_cache_lock:
+            cached = self._did_cache.get(did)
+            if cached is not None and time.monotonic() - cached[0] < self._did_cache_ttl:
+                logger.debug("DID 0x%04X отдан из кэша", did)
+                return cached[1]
+        
+        did_bytes = _DID_BYTES[did]
+        logger.info("🔍 Чтение DID: 0x%04X", did)
         
         try:
-            # Retry механизм для чтения DID
-            def _read_attempt():
-                response = self.send_request(READ_DATA_BY_IDENTIFIER, did_bytes, timeout=2000)
-                
-                if response is None:
-                    raise Exception(f"Нет ответа от ЭБУ для DID 0x{did:04X}")
-                
-                if len(response) < 2:
-                    raise Exception(f"Некорректная длина ответа: {len(response)} байт")
-                
-                # Проверка DID в ответе
-                response_did = (response[0] << 8) | response[1]
-                if response_did != did:
-                    raise Exception(f"Несоответствие DID: ожидался 0x{did:04X}, получен 0x{response_did:04X}")
-                
-                data = response[2:]
-                
-                # Валидация данных
-                if len(data) == 0:
-                    logger.warning(f"⚠️ DID 0x{did:04X} вернул пустые данные")
-                
-                logger.info(f"✅ DID 0x{did:04X}: {data.hex().upper()} ({len(data)} байт)")
-                return data
-            
             # Попытка с retry (только для временных ошибок)
             try:
-                return _read_attempt()
+                return self._read_did_once(did, did_bytes, timeout, quiet)
             except UDSException:
                 # UDS ошибки (например NRC) не требуют retry
                 return None
             except Exception as e:
                 # Для других ошибок пытаемся retry
-                logger.warning(f"⚠️ Ошибка чтения DID 0x{did:04X}, попытка повтора...")
-                time.sleep(0.5)
+                logger.warning("⚠️ Ошибка чтения DID 0x%04X, попытка повтора...", did)
+                time.sleep(0.1)
                 try:
-                    return _read_attempt()
+                    return self._read_did_once(did, did_bytes, timeout, quiet)
                 except Exception:
+                    if quiet:
+                        logger.debug("DID 0x%04X недоступен: %s", did, e)
+                        return None
                     global_error_handler.handle_error(
                         e,
                         severity=ErrorSeverity.WARNING,
                         category=ErrorCategory.DATA,
-                        context={"did": f"0x{did:04X}"},
+                        context={"did": _fmt_did(did)},
                         recovery_hint=f"DID 0x{did:04X} может быть недоступен для этого ЭБУ"
                     )
                     return None
                     
         except UDSException as e:
-            logger.error(f"❌ UDS ошибка чтения DID 0x{did:04X}: {e}")
+            logger.error("❌ UDS ошибка чтения DID 0x%04X: %s", did, e)
             return None
         except Exception as e:
             global_error_handler.handle_error(
                 e,
                 severity=ErrorSeverity.RECOVERABLE,
                 category=ErrorCategory.DATA,
-                context={"did": f"0x{did:04X}"}
+                context={"did": _fmt_did(did)}
             )
             return None
     
-    def start_tester_present(self, interval: float = config.TESTER_PRESENT_INTERVAL):
-        """Запуск фонового потока TesterPresent"""
-        if self._tester_present_thread is not None and self._tester_present_thread.is_alive():
-            logger.warning("TesterPresent поток уже запущен")
-            return
+    def _read_did_once(self, did: int, did_bytes: bytes, timeout: int,
+                       quiet: bool) -> bytes:
+        """Одна попытка чтения DID: запрос, проверка ответа, кэширование
+
+        Метод вместо замыкания внутри read_data_by_identifier: сканы из
+        тысяч DID не создают функцию и ячейки замыкания на каждый вызов.
+        """
+        response = self.send_request(READ_DATA_BY_IDENTIFIER, did_bytes,
+                                     timeout=timeout, quiet=quiet)
         
-        self._stop_tester_present.clear()
-        self._tester_present_thread = threading.Thread(
-            target=self._tester_present_loop,
-            args=(interval,),
-            daemon=True
-        )
-        self._tester_present_thread.start()
-        logger.info(f"TesterPresent поток запущен (интервал {interval} сек)")
+        if response is None:
+            raise Exception(f"Нет ответа от ЭБУ для DID 0x{did:04X}")
+        
+        if len(response) < 2:
+            raise Exception(f"Некорректная длина ответа: {len(response)} байт")
+        
+        # Проверка DID в ответе
+        response_did = int.from_bytes(response[:2], 'big')
+        if response_did != did:
+            raise Exception(f"Несоответствие DID: ожидался 0x{did:04X}, получен 0x{response_did:04X}")
+        
+        data = response[2:]
+        
+        # Валидация данных
+        if len(data) == 0:
+            logger.warning("⚠️ DID 0x%04X вернул пустые данные", did)
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("✅ DID 0x%04X: %s (%d байт)", did, data.hex().upper(), len(data))
+        with self._did_cache_lock:
+            self._did_cache[did] = (time.monotonic(), data)
+        return data
+
+    def invalidate_did(self, did: Optional[int] = None):
+        """Сброс кэша DID (целиком или по одному идентификатору)"""
+        with self._did_cache_lock:
+            if did is None:
+                self._did_cache.clear()
+            else:
+                self._did_cache.pop(did, None)
+
+    def read_data_by_identifiers(self, dids, quiet: bool = False) -> Dict[int, bytes]:
+        """Чтение нескольких DID одним запросом 0x22 (multi-DID)
+
+        UDS 0x22 принимает несколько идентификаторов в одном запросе —
+        один round-trip по шине вместо N. Если ЭБУ не поддерживает
+        multi-DID (или ответ не разбирается), происходит откат на
+        последовательное чтение по одному DID.
+        Возвращает словарь {did: data} только с успешно прочитанными DID.
+        """
+        dids = list(dids)
+        if not dids:
+            return {}
+
+        for did in dids:
+            if did < 0 or did > 0xFFFF:
+                error = ValueError(f"Недопустимый DID: 0x{did:04X}")
+                global_error_handler.handle_error(
+                    error,
+                    severity=ErrorSeverity.WARNING,
+                    category=ErrorCategory.DATA,
+                    recovery_hint="DID должен быть в диапазоне 0x0000-0xFFFF"
+                )
+                return {}
+
+        payload = struct.pack('>%dH' % len(dids), *dids)
+        logger.info("🔍 Чтение %d DID одним запросом", len(dids))
+
+        response = None
+        try:
+            # Таймаут растёт с размером пакета: большой multi-DID ответ —
+            # это длинная ISO-TP передача. Помеченный результат вместо
+            # исключения: отклонённый пакет — ожидаемый исход, не сбой
+            resp = self.send_request_tagged(READ_DATA_BY_IDENTIFIER, payload,
+                                            timeout=max(2000, 200 * len(dids)),
+                                            quiet=quiet)
+            if resp.ok:
+                response = resp.data
+            elif resp.nrc in (0x13, 0x31) and len(dids) > 1:
+                # NRC 0x13 (слишком длинный запрос) или 0x31 (один из DID
+                # вне диапазона) — делим пакет пополам и пробуем меньшими
+                # порциями, чтобы не терять остальные DID
+                logger.debug("Multi-DID пакет из %d DID отклонён (NRC 0x%02X), деление пополам", len(dids), resp.nrc)
+                mid = len(dids) // 2
+                results = self.read_data_by_identifiers(dids[:mid], quiet=quiet)
+                results.update(self.read_data_by_identifiers(dids[mid:], quiet=quiet))
+                return results
+            elif resp.nrc is not None:
+                # Прочие NRC (например, multi-DID не поддерживается) — откат ниже
+                logger.debug("Multi-DID запрос отклонён: NRC=0x%02X", resp.nrc)
+        except Exception as e:
+            logger.warning("⚠️ Ошибка multi-DID запроса: %s", e)
+
+        if response:
+            results = self._parse_did_records(response, dids)
+            if results:
+                return results
+            logger.debug("Multi-DID ответ не разобран, откат на одиночные чтения")
+
+        # Fallback: последовательное чтение по одному DID
+        results = {}
+        for did in dids:
+            data = self.read_data_by_identifier(did, quiet=quiet)
+            if data:
+                results[did] = data
+        return results
+
+    @staticmethod
+    def _parse_did_records(response: bytes, dids) -> Dict[int, bytes]:
+        """Разбор конкатенированных записей [DID | данные] из ответа 0x62
+
+        Длины данных в ответе не передаются, поэтому граница записи
+        определяется эвристически: данные тянутся до позиции, где
+        следующие два байта совпадают с ещё не встреченным запрошенным DID.
+        """
+        results = {}
+        remaining = set(dids)
+        pos = 0
+        n = len(response)
+
+        while pos + 2 <= n and remaining:
+            did = (response[pos] << 8) | response[pos + 1]
+            if did not in remaining:
+                break  # Ответ не соответствует запросу
+            remaining.discard(did)
+            pos += 2
+            start = pos
+
+            # Поиск начала следующей записи
+            while pos + 2 <= n and ((response[pos] << 8) | response[pos + 1]) not in remaining:
+                pos += 1
+            if pos + 2 > n:
+                pos = n  # Хвост ответа принадлежит текущей записи
+
+            if pos > start:
+                results[did] = bytes(response[start:pos])
+
+        return results
+
+    def read_data_by_identifier_async(self, did: int) -> bool:
+        """Отправка запроса 0x22 без ожидания ответа (конвейер)
+
+        Позволяет держать следующий запрос «в полёте», пока разбирается
+        предыдущий ответ: отправка и разбор перекрываются, суммарное
+        время серии чтений приближается к сумме чистых RTT. Ответы
+        забираются receive_next() в порядке поступления.
+        """
+        return self.isotp.send(_READ_DID_SID + _DID_BYTES[did])
+
+    def receive_next(self, timeout: int = 2000) -> Optional[bytes]:
+        """Приём следующего завершённого ответа конвейера 0x22
+
+        Возвращает полезную нагрузку вместе с DID-заголовком
+        ([DID hi, DID lo, данные...]) для сопоставления с запросом,
+        либо None при таймауте или отрицательном ответе.
+        """
+        response = self.isotp.receive(timeout)
+        if not response or len(response) < 3:
+            return None
+        if response[0] == NEGATIVE_RESPONSE:
+            self.last_nrc = response[2]
+            logger.debug("Конвейер 0x22: отрицательный ответ NRC=0x%02X", response[2])
+            return None
+        if response[0] != READ_DATA_BY_IDENTIFIER + POSITIVE_RESPONSE_OFFSET:
+            logger.debug("Конвейер 0x22: неожиданный SID 0x%02X", response[0])
+            return None
+        self.last_nrc = None
+        return response[1:]
+
+    def scan_dids(self, dids, timeout: int = 500) -> Dict[int, bytes]:
+        """Конвейерное сканирование DID: фазы submit и complete
+
+        Вместо строгого «запрос → блокирующий ответ» на каждый DID в полёте
+        держится до _SCAN_PIPELINE_DEPTH запросов 0x22: пока разбирается
+        один ответ, следующие уже идут по шине. Ответы сопоставляются с
+        запросами по DID-заголовку; молчание по таймауту списывается на
+        самый старый запрос окна. Возвращает {did: data} только для
+        ответивших DID.
+        """
+        results = {}
+        pending = []  # DID в полёте, в порядке отправки
+        it = iter(dids)
+        exhausted = False
+
+        while True:
+            # Фаза submit: пополнение окна до глубины конвейера
+            while not exhausted and len(pending) < _SCAN_PIPELINE_DEPTH:
+                try:
+                    did = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if self.read_data_by_identifier_async(did):
+                    pending.append(did)
+
+            if not pending:
+                break
+
+            # Фаза complete: один готовый ответ из конвейера
+            payload = self.receive_next(timeout=timeout)
+            if payload is None or len(payload) < 2:
+                # Таймаут или NRC: без ответа остался самый старый запрос
+                pending.pop(0)
+                continue
+
+            did = int.from_bytes(payload[:2], 'big')
+            if did in pending:
+                pending.remove(did)
+                results[did] = payload[2:]
+
+        return results
+
+    def start_tester_present(self, interval: Optional[float] = None):
+        """Включение фоновой отправки TesterPresent
+
+        interval=None означает config.TESTER_PRESENT_INTERVAL. Поток
+        создаётся один раз и переживает disconnect: повторный старт —
+        это лишь установка Event, без затрат на создание потока.
+        """
+        if interval is None:
+            interval = self._tp_interval
+        with self._tp_lock:
+            self._tp_interval = interval
+            if self._tp_enabled.is_set():
+                logger.warning("TesterPresent уже запущен")
+                return
+
+            self._tp_enabled.set()
+            if self._tester_present_thread is None or not self._tester_present_thread.is_alive():
+                self._tester_present_thread = threading.Thread(
+                    target=self._tester_present_loop,
+                    name="TesterPresent",
+                    daemon=True
+                )
+                self._tester_present_thread.start()
+        logger.info("TesterPresent поток запущен (интервал %s сек)", interval)
     
     def stop_tester_present(self):
-        """Остановка потока TesterPresent"""
-        if self._tester_present_thread is not None:
-            self._stop_tester_present.set()
-            self._tester_present_thread.join(timeout=2.0)
-            logger.info("TesterPresent поток остановлен")
+        """Приостановка отправки TesterPresent (поток остаётся жить)"""
+        with self._tp_lock:
+            if self._tp_enabled.is_set():
+                self._tp_enabled.clear()
+                self._tp_interrupt.set()
+                logger.info("TesterPresent приостановлен")
     
-    def _tester_present_loop(self, interval: float):
-        """Цикл TesterPresent в фоновом потоке"""
-        while not self._stop_tester_present.is_set():
+    def _tester_present_loop(self):
+        """Цикл TesterPresent в фоновом потоке
+
+        Пока гейт снят, поток дремлет на Event.wait и не трогает шину.
+        """
+        while True:
+            if not self._tp_enabled.wait(timeout=1.0):
+                continue
+            self._tp_interrupt.clear()
             try:
-                self.tester_present(suppress_response=True)
+                self._tp_ticks += 1
+                if self._tp_ticks % _TP_FULL_CHECK_EVERY == 0:
+                    # Периодическая полная проверка линка
+                    self.tester_present(suppress_response=True)
+                else:
+                    # Быстрый путь: готовый кадр напрямую в ISO-TP
+                    if self.isotp.send(_TP_FRAME):
+                        self.last_tester_present = time.monotonic()
             except Exception as e:
-                logger.error(f"Ошибка в TesterPresent потоке: {e}")
+                logger.error("Ошибка в TesterPresent потоке: %s", e)
             
-            time.sleep(interval)
+            # Интервал, прерываемый stop_tester_present: Event.wait
+            # просыпается мгновенно вместо досыпания time.sleep
+            self._tp_interrupt.wait(self._tp_interval)